@@ -0,0 +1,29 @@
+import argparse
+import pandas as pd
+from components.backtest import MODELS, backtest
+
+
+def _ints(text):
+    """"1,3,5" → (1, 3, 5); 0 stands for "all nights" in --window."""
+    return tuple(int(x) or None for x in text.split(','))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Walk-forward backtest of the sleep predictor.')
+    parser.add_argument('--models', default=','.join(MODELS),
+                        help=f'comma-separated, from: {", ".join(MODELS)}')
+    parser.add_argument('--k', type=_ints, default=(1, 3, 5, 7),
+                        help='neighbour counts, e.g. 1,3,5')
+    parser.add_argument('--window', type=_ints, default=(30, 90, None),
+                        help='training nights, 0 = all history')
+    parser.add_argument('--step', type=int, default=1,
+                        help='refit every N nights')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    results = backtest(tuple(args.models.split(',')), args.k, args.window,
+                       args.step, args.workers)
+    with pd.option_context('display.width', 120, 'display.max_rows', None):
+        print(results.round(2).to_string(index=False))
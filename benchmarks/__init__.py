@@ -0,0 +1 @@
+from .synthetic import make_log, make_sensors, template_csv, fix_dates_csv
@@ -0,0 +1,59 @@
+# benchmarks/imports.py
+import argparse
+import ast
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+# ── Import-time profile per page ──────────────────────────────────────────
+# Run from the repo root:  python -m benchmarks.imports
+# Each page's top-level imports run in a fresh interpreter under
+# `python -X importtime`, which is what a cold container pays before the
+# page can draw anything. Reported per page: the total, and the slowest
+# top-level packages (cumulative, i.e. including what they pull in).
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES = [ROOT / "🌙 Home.py", *sorted((ROOT / "pages").glob("*.py"))]
+RESULTS = Path(__file__).with_name("importtime.json")
+TOP = 8                            # packages listed per page
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def _import_code(page: Path) -> str:
+    """The page's module-level import statements, as one script."""
+    tree = ast.parse(page.read_text(encoding="utf-8"))
+    return "\n".join(ast.unparse(node) for node in tree.body
+                     if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def profile(page: Path) -> dict:
+    """-X importtime of one page's imports: total ms and top packages."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _import_code(page)],
+        cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"{page.name}: {proc.stderr.strip().splitlines()[-1]}")
+    total, top = 0, {}
+    for self_us, cum_us, indent, name in LINE.findall(proc.stderr):
+        total += int(self_us)
+        if not indent:             # imported by the page itself
+            top[name] = top.get(name, 0) + int(cum_us)
+    slowest = sorted(top.items(), key=lambda kv: -kv[1])[:TOP]
+    return {"page": page.name, "total_ms": total / 1000,
+            "top": [{"module": m, "ms": us / 1000} for m, us in slowest]}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Record how long each page spends importing modules.')
+    parser.add_argument('--out', type=Path, default=RESULTS)
+    args = parser.parse_args()
+
+    report = [profile(page) for page in PAGES]
+    for r in report:
+        print(f"{r['page']:<28} {r['total_ms']:9.1f} ms   " + ", ".join(
+            f"{t['module']} {t['ms']:.0f}" for t in r["top"][:4]))
+    args.out.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"Profile saved to: {args.out}")
@@ -0,0 +1,202 @@
+# benchmarks/run.py
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_log, make_sensors, template_csv, fix_dates_csv
+from clean import fix_dates
+from components import ml_predictor
+from components.ml_predictor import next_sleep_forecast, forecast_for_date
+from components.timeline import split_segments, night_bands
+from utils import data_io, rollups, row_index, sensors
+from utils.data_io import load, append, upsert, import_external
+
+# ── Benchmark runner ──────────────────────────────────────────────────────
+# Run from the repo root:  python -m benchmarks.run [--sizes …]
+# Every size runs in a fresh temporary working directory holding a
+# synthetic data/ folder, so the app's relative paths point at it and the
+# real log is never touched. Each operation is timed REPEAT times (after
+# an untimed setup) and the median is reported.
+
+SIZES = [10**2, 10**3, 10**4, 10**5]           # up to 10**7 via --sizes
+REPEAT = 3
+BASELINE = Path(__file__).with_name("baseline.json")
+RESULTS = Path(__file__).with_name("results.json")
+TOLERANCE = 0.25                   # slower than baseline by more → flagged
+NOISE_FLOOR_S = 0.005              # ignore differences below 5 ms
+
+
+def _reset() -> None:
+    """Forget every in-process cache (next call works from disk)."""
+    data_io.invalidate_cache()
+    rollups._STATE.clear()
+    row_index._STATE.clear()
+    sensors._OPEN.clear()
+    sensors._ANNOTATED.clear()
+    ml_predictor._MODELS.clear()
+
+
+def _cold_models() -> None:
+    ml_predictor._MODELS.clear()
+    shutil.rmtree(ml_predictor.MODEL_DIR, ignore_errors=True)
+
+
+def _prepare(n: int, seed: int) -> dict:
+    """Write the synthetic log, sensor exports and CSV inputs into ./data."""
+    log = make_log(n, seed)
+    data_io.DATA_DIR.mkdir(exist_ok=True)
+    data_io.overwrite(log)
+    hr, stress = make_sensors(log, seed=seed)
+    hr.to_csv(sensors.HR_CSV, index=False)
+    stress.to_csv(sensors.STRESS_CSV, index=False)
+    template_csv(log).to_csv("template.csv", index=False)
+    fix_dates_csv(log).to_csv("raw.csv", index=False)
+    _reset()
+    return {"last": log["start_time"].max()}
+
+
+def _operations(ctx: dict) -> dict:
+    """{name: (untimed setup or None, timed call)} – in run order."""
+    rng = np.random.default_rng(0)
+
+    def history_save():
+        # what the History page's save does: upsert a few edited rows
+        rows = load().dropna(subset=["start_time", "end_time"]).sample(
+            7, replace=True, random_state=int(rng.integers(1 << 31))).copy()
+        rows["sleep_score"] = rng.integers(40, 101, len(rows))
+        upsert(rows)
+
+    def append_one():
+        ctx["last"] += pd.Timedelta(days=1)
+        append(pd.DataFrame({
+            "start_time": [ctx["last"]],
+            "end_time": [ctx["last"] + pd.Timedelta(hours=8)],
+            "sleep_duration": [8.0], "sleep_score": [80]}))
+
+    def quiet_fix_dates():
+        with contextlib.redirect_stdout(io.StringIO()):
+            fix_dates("raw.csv", "fixed.csv")
+
+    horizon = (ctx["last"] + pd.Timedelta(days=365)).date()
+    window = ctx["last"].normalize() - pd.Timedelta(days=10)    # Charts default
+    return {
+        "load_cold":           (_reset, load),
+        "load_warm":           (load, load),
+        "load_window":         (_reset, lambda: load(start=window)),
+        "load_sensors":        (_reset, lambda: load(sensors=True)),
+        "charts_segments":     (load, lambda: split_segments(load())),
+        "charts_bands":        (load, lambda: night_bands(load(), "M")),
+        "next_sleep_forecast": (_cold_models, next_sleep_forecast),
+        "forecast_for_date":   (None, lambda: forecast_for_date(horizon)),
+        "history_save":        (None, history_save),
+        "append":              (None, append_one),
+        "import_external":     (None, lambda: import_external("template.csv")),
+        "reimport_external":   (None, lambda: import_external("template.csv")),
+        "fix_dates":           (None, quiet_fix_dates),
+    }
+
+
+def run(sizes=SIZES, repeat=REPEAT, only=None, seed=0) -> list[dict]:
+    """Time every operation at every size; one result dict per pair."""
+    results, home = [], os.getcwd()
+    for n in sizes:
+        with tempfile.TemporaryDirectory(prefix="sleep-bench-") as tmp:
+            os.chdir(tmp)
+            try:
+                ops = _operations(_prepare(n, seed))
+                for name, (setup, call) in ops.items():
+                    if only and name not in only:
+                        continue
+                    times = []
+                    for _ in range(repeat):
+                        if setup:
+                            setup()
+                        began = time.perf_counter()
+                        call()
+                        times.append(time.perf_counter() - began)
+                    results.append({"op": name, "rows": n,
+                                    "median_s": float(np.median(times)),
+                                    "min_s": float(min(times)),
+                                    "repeat": repeat})
+                    print(f"{name:<20} {n:>11,} rows {1000 * np.median(times):11.1f} ms",
+                          flush=True)
+            finally:
+                os.chdir(home)
+                _reset()
+    return results
+
+
+def compare(results: list[dict], baseline: list[dict],
+            tolerance=TOLERANCE) -> list[dict]:
+    """
+    Results slower than the baseline by more than `tolerance`, compared
+    on the fastest run (least disturbed by other load on the machine).
+    """
+    base = {(r["op"], r["rows"]): r["min_s"] for r in baseline}
+    slow = []
+    for r in results:
+        old = base.get((r["op"], r["rows"]))
+        if old is None:
+            continue
+        if r["min_s"] - old > NOISE_FLOOR_S and r["min_s"] > old * (1 + tolerance):
+            slow.append({**r, "baseline_s": old, "ratio": r["min_s"] / old})
+    return slow
+
+
+def _meta() -> dict:
+    return {
+        "when": pd.Timestamp.now(data_io.TZ).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "storage": data_io.STORAGE,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Time the app\'s data paths on synthetic logs.')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                        help='row counts, e.g. 100,10000,1000000')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--only', default=None,
+                        help='comma-separated operation names')
+    parser.add_argument('--out', type=Path, default=RESULTS)
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed slowdown vs baseline (0.25 = 25 %%)')
+    args = parser.parse_args()
+
+    sizes = [int(float(s)) for s in args.sizes.split(',')]
+    only = set(args.only.split(',')) if args.only else None
+    report = {"meta": _meta(), "results": run(sizes, args.repeat, only)}
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f"Results saved to: {args.out}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to: {args.baseline}")
+    elif args.baseline.exists():
+        slow = compare(report["results"],
+                       json.loads(args.baseline.read_text())["results"],
+                       args.tolerance)
+        for r in slow:
+            print(f"REGRESSION {r['op']} @ {r['rows']:,} rows: "
+                  f"{1000 * r['baseline_s']:.1f} → {1000 * r['min_s']:.1f} ms "
+                  f"(x{r['ratio']:.2f})")
+        if slow:
+            sys.exit(1)
+        print("No regressions against the baseline.")
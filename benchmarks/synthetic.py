@@ -0,0 +1,131 @@
+# benchmarks/synthetic.py
+import numpy as np
+import pandas as pd
+from utils.data_io import COLUMNS, TZ
+
+# ── Synthetic sleep history ───────────────────────────────────────────────
+# One main sleep per day (bedtime ~23:30 ± 1 h, later on weekends, often
+# past midnight), plus afternoon naps, skipped days, duplicated days and
+# blank scores. Past MAX_DAYS days the extra rows become more naps on the
+# same days, so 10^7 rows still fit pandas' timestamp range.
+
+END = pd.Timestamp("2025-06-01")
+MAX_DAYS = 100_000                 # ~270 years back from END
+NAP_RATE = 0.10                    # share of days with an afternoon nap
+GAP_RATE = 0.05                    # days with nothing logged
+DUP_RATE = 0.02                    # rows logged twice
+BLANK_RATE = 0.03                  # score cells left empty
+SCORE_COLS = ["physical_recovery", "mental_recovery",
+              "sleep_cycle", "sleep_score"]
+
+
+def _sessions(days: pd.DatetimeIndex, bed_min, dur_h) -> pd.DataFrame:
+    start = days + pd.to_timedelta(np.round(bed_min), unit="min")
+    end = start + pd.to_timedelta(np.round(dur_h * 60), unit="min")
+    return pd.DataFrame({"start_time": start, "end_time": end})
+
+
+def make_log(n: int, seed: int = 0) -> pd.DataFrame:
+    """`n` rows in the COLUMNS schema of utils.data_io, oldest first."""
+    rng = np.random.default_rng(seed)
+    rows_per_day = 1 + NAP_RATE + DUP_RATE - GAP_RATE
+    n_days = int(min(MAX_DAYS, max(1, np.ceil(n / rows_per_day))))
+    days = pd.date_range(end=END, periods=n_days, freq="D")
+    days = days[rng.random(n_days) >= GAP_RATE]
+
+    # main sleep: bedtime in minutes after 00:00 of its day (may be > 24 h)
+    weekend = days.dayofweek >= 4
+    bed = rng.normal(23.5 * 60, 60, len(days)) + 45 * weekend
+    main = _sessions(days, bed, rng.normal(7.5, 1.0, len(days)).clip(3, 11))
+
+    # naps fill up to n: ~NAP_RATE per day, more once MAX_DAYS is reached
+    n_naps = max(0, int(n / (1 + DUP_RATE)) - len(main))
+    nap_days = days[rng.integers(0, len(days), n_naps)]
+    naps = _sessions(nap_days, rng.normal(14 * 60, 45, n_naps),
+                     rng.uniform(0.3, 1.5, n_naps))
+
+    df = pd.concat([main, naps], ignore_index=True)
+    dup = df.sample(frac=DUP_RATE, random_state=seed)
+    df = pd.concat([df, dup], ignore_index=True).iloc[:n]
+    m = len(df)
+
+    df["physical_recovery"] = rng.integers(40, 101, m)
+    df["mental_recovery"] = rng.integers(40, 101, m)
+    df["sleep_cycle"] = rng.integers(1, 7, m)
+    df["sleep_score"] = rng.integers(40, 101, m)
+    for c in SCORE_COLS:
+        df[c] = df[c].astype("UInt8").mask(rng.random(m) < BLANK_RATE)
+    df["sleep_duration"] = ((df["end_time"] - df["start_time"])
+                            .dt.total_seconds() / 3600).round(2)
+    df["create_time"] = df["end_time"] + pd.to_timedelta(
+        rng.integers(1, 120, m), unit="min")
+    df["update_time"] = df["create_time"]
+    return (df.sort_values("start_time", kind="stable")
+              .reset_index(drop=True)[COLUMNS])
+
+
+def template_csv(df: pd.DataFrame) -> pd.DataFrame:
+    """The log as a cleaned Sheets template (HH:MM times) for import_external."""
+    return pd.DataFrame({
+        "date_only": df["start_time"].dt.strftime("%Y-%m-%d"),
+        "start_time": df["start_time"].dt.strftime("%H:%M"),
+        "end_time": df["end_time"].dt.strftime("%H:%M"),
+        **{c: df[c] for c in SCORE_COLS},
+        "sleep_duration": df["sleep_duration"],
+    })
+
+
+def fix_dates_csv(df: pd.DataFrame) -> pd.DataFrame:
+    """Input for clean.fix_dates: date_only next to full datetimes."""
+    out = template_csv(df)
+    out["start_time"] = df["start_time"]
+    out["end_time"] = df["end_time"]
+    return out
+
+
+# ── Matching Samsung sensor exports ───────────────────────────────────────
+def _samsung_utc(local: pd.Series) -> pd.Series:
+    """Naïve local times → Samsung's naïve UTC strings."""
+    # offsets only change on the hour: localise each distinct hour once,
+    # by zone name (pandas' fast path, unlike a ZoneInfo object)
+    codes, hours = pd.factorize(local.dt.floor("h"))
+    hours = pd.DatetimeIndex(hours)
+    offset = (hours.tz_localize(TZ.key, nonexistent="shift_forward", ambiguous="NaT")
+                   .tz_convert("UTC").tz_localize(None) - hours)
+    utc = local + offset[codes].to_numpy()
+    return utc.dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def make_sensors(log: pd.DataFrame, hr_per_session: int = 8,
+                 seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Heart-rate samples inside each session and hourly stress windows
+    around it, shaped like the Samsung Health CSV exports.
+    """
+    rng = np.random.default_rng(seed)
+    log = log.dropna(subset=["start_time", "end_time"])
+    span = (log["end_time"] - log["start_time"]).to_numpy()
+
+    idx = np.repeat(np.arange(len(log)), hr_per_session)
+    at = log["start_time"].to_numpy()[idx] + span[idx] * rng.random(len(idx))
+    hr = pd.DataFrame({
+        "com.samsung.health.heart_rate.create_time":
+            _samsung_utc(pd.Series(at).dt.floor("s")),
+        "com.samsung.health.heart_rate.heart_rate":
+            rng.normal(60, 7, len(idx)).clip(40, 180).round().astype(int),
+    }).sort_values("com.samsung.health.heart_rate.create_time")
+
+    hours = pd.Series(log["start_time"].dt.floor("h").unique())
+    hours = pd.Series(np.concatenate([hours, hours + pd.Timedelta(hours=1)]))
+    hours = hours.drop_duplicates().sort_values().reset_index(drop=True)
+    score = rng.integers(0, 60, len(hours))
+    stress = pd.DataFrame({
+        "start_time": _samsung_utc(hours),
+        "update_time": _samsung_utc(hours + pd.Timedelta(hours=1)),
+        "create_time": _samsung_utc(hours + pd.Timedelta(minutes=50)),
+        "max": (score + rng.integers(0, 40, len(hours))).clip(0, 100),
+        "min": (score - rng.integers(0, 10, len(hours))).clip(0, 100),
+        "score": score,
+        "end_time": _samsung_utc(hours + pd.Timedelta(hours=1)),
+    })
+    return hr, stress
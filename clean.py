@@ -1,9 +1,152 @@
+import argparse
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
 
+OUT_COLS = [
+    'date_only', 'start_time', 'end_time',
+    'physical_recovery', 'mental_recovery',
+    'sleep_cycle', 'sleep_score', 'sleep_duration'
+]
+TIME_COLS = ['start_time', 'end_time']
+US_PER_DAY = 86_400 * 10**6
 
-def fix_dates(input_path, output_path):
+
+def _read(input_path, chunksize=None, dtype=None):
+    """read_csv as fix_dates always has: start/end parsed, one dtype per column."""
+    return pd.read_csv(
+        input_path,
+        parse_dates=TIME_COLS,
+        low_memory=False,
+        dtype=dtype,
+        chunksize=chunksize,
+    )
+
+
+def _rebuild(df):
+    """
+    Vectorised core: put each start/end time-of-day on 'date_only',
+    roll overnight spans (end <= start → +1 day) and recompute
+    'sleep_duration'. Returns (date, start, end, duration, valid).
+    """
+    date = pd.to_datetime(df['date_only'], errors='coerce').dt.normalize()
+    # time-of-day, truncated to µs like datetime.time
+    s_tod = (df['start_time'] - df['start_time'].dt.normalize()).dt.floor('us')
+    e_tod = (df['end_time'] - df['end_time'].dt.normalize()).dt.floor('us')
+
+    valid = date.notna() & s_tod.notna() & e_tod.notna()
+    start = (date + s_tod).where(valid)
+    end = (date + e_tod).where(valid)
+    end = end.mask(end <= start, end + pd.Timedelta(days=1))
+
+    # Duration in hours, rounded exactly like Python's round(x, 2):
+    # round each distinct value once, then broadcast back
+    span_us = (end - start).to_numpy(dtype='timedelta64[us]').astype('int64')
+    uniq, inv = np.unique(span_us[valid.to_numpy()], return_inverse=True)
+    hours = np.array([round(u / 10**6 / 3600.0, 2) for u in uniq.tolist()])
+    dur = df['sleep_duration'].astype(object)
+    if len(uniq):
+        dur[valid.to_numpy()] = hours[inv]
+    return date, start, end, dur, valid
+
+
+def _time_flags(col):
+    """What pandas' CSV writer looks at: un-normalised / µs / ms values."""
+    i8 = col.dropna().to_numpy(dtype='datetime64[us]').astype('int64')
+    return {
+        'time': bool((i8 % US_PER_DAY != 0).any()),
+        'us': bool((i8 % 1000 != 0).any()),
+        'ms': bool((i8 % 10**6 != 0).any()),
+    }
+
+
+def _dt_format(flags):
+    """strftime pattern + slice matching to_csv's choice for a whole column."""
+    if not flags['time']:
+        return '%Y-%m-%d', None
+    if flags['us']:
+        return '%Y-%m-%d %H:%M:%S.%f', None
+    if flags['ms']:
+        return '%Y-%m-%d %H:%M:%S.%f', -3
+    return '%Y-%m-%d %H:%M:%S', None
+
+
+def _scan(chunk):
+    """Pass 1 (per chunk): column kinds + datetime flags of the result."""
+    _, start, end, _, valid = _rebuild(chunk)
+    kinds = {c: chunk[c].dtype.kind for c in chunk.columns if c not in TIME_COLS}
+    return kinds, _time_flags(start), _time_flags(end), bool(valid.any())
+
+
+def _merge_kind(kinds):
+    """Dtype read_csv would infer for the whole column from per-chunk kinds."""
+    kinds = set(kinds)
+    if kinds == {'b'}:
+        return 'bool'
+    if 'O' in kinds or 'b' in kinds or 'M' in kinds:
+        return object
+    if 'f' in kinds:
+        return 'float64'
+    if 'u' in kinds and 'i' in kinds:
+        return 'float64'
+    return 'uint64' if 'u' in kinds else 'int64'
+
+
+def _fix_chunk(args):
+    """Pass 2 (per chunk, in a worker): corrected rows as CSV text."""
+    chunk, formats, header, dur_float = args
+    date, start, end, dur, _ = _rebuild(chunk)
+
+    out = chunk.copy()
+    out['date_only'] = date.dt.strftime('%Y-%m-%d')
+    for col, vals in (('start_time', start), ('end_time', end)):
+        fmt, cut = formats[col]
+        text = vals.dt.strftime(fmt)
+        out[col] = text.str[:cut] if cut else text
+    out['sleep_duration'] = dur.astype('float64') if dur_float else dur
+    return out[OUT_COLS].to_csv(index=False, header=header)
+
+
+def _fix_stream(input_path, output_path, chunksize, workers):
+    """Chunked fix_dates: bounded memory, optional process pool, same bytes."""
+    # Pass 1: the whole-file facts to_csv would have used
+    kinds, flags = {}, {c: {'time': False, 'us': False, 'ms': False}
+                        for c in TIME_COLS}
+    any_valid = False
+    for chunk in _read(input_path, chunksize):
+        k, s_flags, e_flags, v = _scan(chunk)
+        for c, kind in k.items():
+            kinds.setdefault(c, set()).add(kind)
+        for c, f in zip(TIME_COLS, (s_flags, e_flags)):
+            flags[c] = {n: flags[c][n] or f[n] for n in f}
+        any_valid |= v
+    dtype = {c: _merge_kind(k) for c, k in kinds.items() if c != 'date_only'}
+    formats = {c: _dt_format(flags[c]) for c in TIME_COLS}
+    dur_float = any_valid and dtype.get('sleep_duration') != object
+
+    # Pass 2: fix chunks (in order) and append them to the output
+    jobs = ((chunk, formats, i == 0, dur_float)
+            for i, chunk in enumerate(_read(input_path, chunksize, dtype)))
+    with open(output_path, 'w', newline='', encoding='utf-8') as fh:
+        if workers <= 1:
+            for job in jobs:
+                fh.write(_fix_chunk(job))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                for job in jobs:
+                    pending.append(pool.submit(_fix_chunk, job))
+                    if len(pending) >= 2 * workers:      # bounded in-flight
+                        fh.write(pending.popleft().result())
+                while pending:
+                    fh.write(pending.popleft().result())
+        if fh.tell() == 0:                  # empty input: header only
+            fh.write(pd.DataFrame(columns=OUT_COLS).to_csv(index=False))
+
+
+def fix_dates(input_path, output_path, chunksize=None, workers=1):
     """
     Reads a CSV with columns:
       date_only, start_time, end_time, physical_recovery, mental_recovery,
@@ -13,76 +156,44 @@ def fix_dates(input_path, output_path):
     handles overnight spans (end <= start → +1 day),
     recalculates 'sleep_duration' in hours (rounded to 2 decimals),
     and writes the corrected DataFrame (including duplicates) out to output_path.
-    """
-    # Load data, parsing original start/end (to capture time component)
-    df = pd.read_csv(
-        input_path,
-        parse_dates=['start_time', 'end_time'],
-        infer_datetime_format=True,
-        low_memory=False
-    )
 
-    # Ensure 'date_only' is interpreted as a date
-    df['date_only'] = pd.to_datetime(df['date_only'], errors='coerce').dt.date
-
-    # Extract time-of-day from possibly misdated datetimes
-    df['start_t'] = df['start_time'].dt.time
-    df['end_t'] = df['end_time'].dt.time
-
-    new_starts = []
-    new_ends = []
-    new_durs = []
-
-    for _, row in df.iterrows():
-        date = row['date_only']
-        s_time = row['start_t']
-        e_time = row['end_t']
-
-        # If any key component is missing, leave as NaT/NA
-        if pd.isna(date) or pd.isna(s_time) or pd.isna(e_time):
-            new_starts.append(pd.NaT)
-            new_ends.append(pd.NaT)
-            new_durs.append(row.get('sleep_duration', pd.NA))
-            continue
-
-        # Combine date + time
-        start_dt = datetime.combine(date, s_time)
-        end_dt = datetime.combine(date, e_time)
-
-        # Overnight: if end is on or before start, roll to next day
-        if end_dt <= start_dt:
-            end_dt += timedelta(days=1)
-
-        # Compute duration in hours, 2-decimal
-        duration_h = round((end_dt - start_dt).total_seconds() / 3600.0, 2)
+    With `chunksize`, the input is streamed in chunks of that many rows
+    (fixed by `workers` processes) and written incrementally in the
+    original order; the output bytes are the same either way.
+    """
+    if chunksize:
+        _fix_stream(input_path, output_path, chunksize, workers)
+        print(f"Fixed dates & durations saved to: {output_path}")
+        return
 
-        new_starts.append(start_dt)
-        new_ends.append(end_dt)
-        new_durs.append(duration_h)
+    # Load data, parsing original start/end (to capture time component)
+    df = _read(input_path)
+    date, start, end, dur, valid = _rebuild(df)
 
     # Assign corrected columns
-    df['start_time'] = new_starts
-    df['end_time'] = new_ends
-    df['sleep_duration'] = new_durs
-
-    # Drop temp columns
-    df.drop(columns=['start_t', 'end_t'], inplace=True)
-
-    # Reorder to your desired schema
-    out_cols = [
-        'date_only', 'start_time', 'end_time',
-        'physical_recovery', 'mental_recovery',
-        'sleep_cycle', 'sleep_score', 'sleep_duration'
-    ]
-    df = df[out_cols]
-
-    # Write to CSV
-    df.to_csv(output_path, index=False)
+    df['date_only'] = date.dt.date
+    df['start_time'] = start
+    df['end_time'] = end
+    df['sleep_duration'] = dur.infer_objects()
+
+    # Reorder to your desired schema & write to CSV
+    df[OUT_COLS].to_csv(output_path, index=False)
     print(f"Fixed dates & durations saved to: {output_path}")
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        print('Usage: python fix_dates.py input.csv output.csv')
+    parser = argparse.ArgumentParser(
+        description='Fix start/end dates and durations of a sleep CSV.',
+        usage='python fix_dates.py input.csv output.csv '
+              '[--chunksize N] [--workers N]')
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='stream the input N rows at a time')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes fixing chunks (needs --chunksize)')
+    if len(sys.argv) < 3:
+        parser.print_usage()
         sys.exit(1)
-    fix_dates(sys.argv[1], sys.argv[2])
+    args = parser.parse_args()
+    fix_dates(args.input, args.output, args.chunksize, args.workers)
@@ -0,0 +1,174 @@
+# components/backtest.py
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KNeighborsRegressor
+from utils.data_io import load
+from utils.timeviews import minute_of_day
+
+# ── Walk-forward backtest of the bedtime predictor ────────────────────────
+# For every night t after the first MIN_TRAIN, a model is fitted on the
+# nights before t (optionally only the last `window` of them), predicts
+# night t's bedtime from night t-1, and is scored against what happened.
+# Each (model, k, window) configuration runs in its own worker process.
+
+MINUTES = 24 * 60
+MIN_TRAIN = 14                     # nights before the first scored one
+
+
+def _circular_error(pred, actual):
+    """Minutes between two clock times, the short way round midnight."""
+    d = np.abs(np.asarray(pred) - np.asarray(actual)) % MINUTES
+    return np.minimum(d, MINUTES - d)
+
+
+def _circular_mean(minutes):
+    angle = np.asarray(minutes) * (2 * np.pi / MINUTES)
+    mean = np.arctan2(np.sin(angle).mean(), np.cos(angle).mean())
+    return int(round(mean * MINUTES / (2 * np.pi))) % MINUTES
+
+
+def _to_circle(minutes):
+    angle = np.asarray(minutes, dtype="float64").reshape(-1, 1) \
+        * (2 * np.pi / MINUTES)
+    return np.hstack([np.sin(angle), np.cos(angle)])
+
+
+# ── Models ────────────────────────────────────────────────────────────────
+# fit(prev, nxt, k) → state; predict(state, last) → minute. prev/nxt are
+# the start minutes of consecutive training nights.
+
+def _fit_knn(prev, nxt, k):
+    # what components.ml_predictor serves
+    return KNeighborsRegressor(n_neighbors=k).fit(prev.reshape(-1, 1), nxt)
+
+
+def _predict_knn(model, last):
+    return int(model.predict([[last]])[0]) % MINUTES
+
+
+def _fit_knn_circular(prev, nxt, k):
+    # same neighbours, measured on the clock face; averages wrap midnight
+    model = KNeighborsRegressor(n_neighbors=k).fit(_to_circle(prev), nxt)
+    return model, nxt
+
+
+def _predict_knn_circular(state, last):
+    model, nxt = state
+    idx = model.kneighbors(_to_circle([last]), return_distance=False)[0]
+    return _circular_mean(nxt[idx])
+
+
+def _fit_mean(prev, nxt, k):
+    return _circular_mean(nxt)
+
+
+def _predict_mean(state, last):
+    return state
+
+
+def _fit_last(prev, nxt, k):
+    return None
+
+
+def _predict_last(state, last):
+    return last
+
+
+MODELS = {
+    "knn":          (_fit_knn, _predict_knn),
+    "knn_circular": (_fit_knn_circular, _predict_knn_circular),
+    "mean":         (_fit_mean, _predict_mean),
+    "last":         (_fit_last, _predict_last),
+}
+USES_K = {"knn", "knn_circular"}
+
+
+def history() -> pd.DataFrame:
+    """start minute-of-day and duration of every night, oldest first."""
+    df = load(columns=["start_time", "sleep_duration"])
+    df = df.dropna(subset=["start_time"]).sort_values("start_time")
+    return pd.DataFrame({
+        "minute": minute_of_day(df["start_time"]).to_numpy(dtype="int64"),
+        "duration": df["sleep_duration"].to_numpy(dtype="float64"),
+    })
+
+
+def run_config(job) -> dict:
+    """Walk-forward replay of one (model, k, window) configuration."""
+    minutes, durations, model, k, window, step = job
+    fit, predict = MODELS[model]
+    n = len(minutes)
+
+    bed_err, dur_err, fit_s, pred_s = [], [], [], []
+    state = None
+    for i, t in enumerate(range(MIN_TRAIN, n)):
+        lo = 0 if not window else max(0, t - window)
+        if state is None or i % step == 0:         # refit every `step` nights
+            began = time.perf_counter()
+            state = fit(minutes[lo:t - 1], minutes[lo + 1:t], k)
+            fit_s.append(time.perf_counter() - began)
+            dur_hat = np.nanmedian(durations[lo:t]) \
+                if np.isfinite(durations[lo:t]).any() else np.nan
+
+        began = time.perf_counter()
+        bed_hat = predict(state, minutes[t - 1])
+        pred_s.append(time.perf_counter() - began)
+
+        bed_err.append(_circular_error(bed_hat, minutes[t]))
+        if np.isfinite(durations[t]) and np.isfinite(dur_hat):
+            dur_err.append(abs(dur_hat - durations[t]))
+
+    bed_err = np.asarray(bed_err, dtype="float64")
+    return {
+        "model": model,
+        "k": k if model in USES_K else None,
+        "window": window or None,
+        "nights": len(bed_err),
+        "bed_mae_min": bed_err.mean() if len(bed_err) else np.nan,
+        "bed_p90_min": np.percentile(bed_err, 90) if len(bed_err) else np.nan,
+        "within_30min": (bed_err <= 30).mean() if len(bed_err) else np.nan,
+        "dur_mae_h": np.mean(dur_err) if dur_err else np.nan,
+        "fit_ms": 1000 * np.mean(fit_s) if fit_s else np.nan,
+        "predict_ms": 1000 * np.mean(pred_s) if pred_s else np.nan,
+    }
+
+
+def grid(models=tuple(MODELS), ks=(1, 3, 5, 7), windows=(30, 90, None)):
+    """(model, k, window) configurations; k only varies where it matters."""
+    jobs = set()
+    for model, k, window in itertools.product(models, ks, windows):
+        if window and window < k + 1:
+            continue                # too few nights to find k neighbours
+        jobs.add((model, k if model in USES_K else None, window))
+    return sorted(jobs, key=lambda j: (j[0], j[1] or 0, j[2] or 0))
+
+
+def backtest(models=tuple(MODELS), ks=(1, 3, 5, 7), windows=(30, 90, None),
+             step=1, workers=None) -> pd.DataFrame:
+    """
+    Score every configuration of the grid against the history from
+    load(), best bedtime accuracy first. `step` refits every N nights;
+    `workers` processes share the grid (None: one per CPU).
+    """
+    unknown = set(models) - set(MODELS)
+    if unknown:
+        raise ValueError(f"Unknown model(s) {sorted(unknown)}; pick from {list(MODELS)}")
+    hist = history()
+    if len(hist) <= MIN_TRAIN or max(ks) + 1 > MIN_TRAIN:
+        raise ValueError(f"Need more than {MIN_TRAIN} nights and k < {MIN_TRAIN}.")
+    jobs = [(hist["minute"].to_numpy(), hist["duration"].to_numpy(),
+             model, k or 1, window, step)
+            for model, k, window in grid(models, ks, windows)]
+
+    if workers == 1:
+        rows = list(map(run_config, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(run_config, jobs))
+    return (pd.DataFrame(rows)
+              .astype({"k": "Int64", "window": "Int64"})
+              .sort_values(["bed_mae_min", "predict_ms"])
+              .reset_index(drop=True))
@@ -1,73 +1,209 @@
 # components/ml_predictor.py
+import hashlib
+import os
+import threading
+import numpy as np
 import pandas as pd
 from datetime import timedelta
 from zoneinfo import ZoneInfo
-from sklearn.neighbors import KNeighborsRegressor
-from utils.data_io import load
+from utils.data_io import DATA_DIR, data_version, load
+from utils.perf import timed
+from utils.timeviews import hhmm, views
 
 tz = ZoneInfo("Asia/Taipei")
 
+# Fitted models live in memory and in MODEL_DIR, stamped with the
+# data_version() they were built for. When the version moves, the training
+# data is re-read and hashed; only a different hash means a refit.
+# Only the transition table is saved, never the sklearn model, so serving
+# a forecast from disk doesn't import scikit-learn (≈1.5 s cold); sklearn
+# and joblib are imported on first use.
+MODEL_DIR = DATA_DIR / "models"
+MINUTES = 24 * 60                  # the model's whole state space
+_MODELS: dict = {}                 # {k: entry}, see _refresh()
+_LOCK = threading.Lock()
 
-def _clean_df():
-    """Return DF without NaNs in start_time, sorted chronologically."""
-    df = load()
-    df = df.dropna(subset=["start_time"]).copy()
-    df["start_time"] = pd.to_datetime(df["start_time"])
-    df.sort_values("start_time", inplace=True)
-    return df
 
+def _model_path(k):
+    return MODEL_DIR / f"knn_k{k}.joblib"
 
-def _knn_model(k=3):
-    df = _clean_df()
-    if len(df) < k + 1:
-        return None, df
-    minutes = df["start_time"].dt.hour * 60 + df["start_time"].dt.minute
-    X, y = minutes[:-1].values.reshape(-1, 1), minutes[1:]
+
+def _restore(k):
+    """Entry saved by _refresh() (None when missing or unreadable)."""
+    import joblib
+    try:
+        entry = joblib.load(_model_path(k))
+    except Exception:
+        return None
+    if "table" not in entry or "model" in entry:     # older layouts
+        return None
+    return entry
+
+
+def _transition_table(minutes, k):
+    """
+    Fit KNN on consecutive start minutes, then predict the next start for
+    every minute of the day in one call. None with too little data.
+    """
+    if len(minutes) < k + 1:
+        return None
+    from sklearn.neighbors import KNeighborsRegressor
+    X, y = minutes[:-1].reshape(-1, 1), minutes[1:]
     model = KNeighborsRegressor(n_neighbors=k).fit(X, y)
-    return model, df
+    pred = model.predict(np.arange(MINUTES).reshape(-1, 1))
+    return (pred.astype("int64") % MINUTES).astype("int16")
 
 
-def _roll_one_step(model, last_start):
-    last_min = last_start.hour * 60 + last_start.minute
-    next_min = int(model.predict([[last_min]])[0]) % (24 * 60)
-    h, m = divmod(next_min, 60)
-    next_start = last_start.normalize().replace(hour=h, minute=m)
-    if next_start <= last_start:
-        next_start += timedelta(days=1)
-    return next_start
+@timed(name="ml_predictor.fit")
+def _refresh(k, version, prev):
+    """Re-read the training data; refit only if its hash changed."""
+    nights = views()                    # dated rows, oldest first
+    df = load().loc[nights.index]
+    minutes = nights["start_min"].to_numpy(dtype="int64")
+    last_start = df["start_time"].iloc[-1] if len(df) else None
+    duration = float(df["sleep_duration"].median())
+    digest = hashlib.sha1(
+        minutes.tobytes() + repr((str(last_start), duration, k)).encode()
+    ).hexdigest()
 
+    if prev is not None and prev["digest"] == digest:
+        table = prev["table"]
+    else:
+        table = _transition_table(minutes, k)
 
-def next_sleep_forecast():
-    model, df = _knn_model()
-    if model is None:
-        return {"error": "Need more non-empty rows first."}
+    entry = {"version": version, "digest": digest, "table": table,
+             "last_start": last_start, "duration": duration}
+    import joblib
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = _model_path(k).with_suffix(".tmp")
+    joblib.dump(entry, tmp)
+    os.replace(tmp, _model_path(k))
+    return entry
+
+
+def _knn_model(k=3):
+    """
+    Entry for `k` neighbours: the model's transition table (None with too
+    little data), the last start_time and the median duration the
+    forecasts use. Cached per data version, so reruns don't reload or refit.
+    """
+    version = data_version()
+    with _LOCK:
+        entry = _MODELS.get(k)
+        if entry is None or entry["version"] != version:
+            entry = _restore(k) or entry
+        if entry is None or entry["version"] != version:
+            entry = _refresh(k, version, entry)
+        _MODELS[k] = entry
+    return entry
+
+
+# ── Rolling the forecast forward ──────────────────────────────────────────
+# One step maps the start minute m to table[m], a day later when the new
+# minute isn't after m. Since there are only 1440 minutes, the walk from
+# any start repeats within 1440 steps; after that it cycles, gaining a
+# fixed number of days per lap, so any horizon is a lookup, not a loop.
+
+
+def _orbit(table, m0):
+    """
+    Walk from minute m0 until a minute repeats. Returns (minutes, days,
+    mu, lap_days): the minute and elapsed days at each step, the step
+    where the cycle starts, and the days one lap of the cycle adds.
+    """
+    seen, minutes, days = {}, [], []
+    m, d = m0, 0
+    while m not in seen:
+        seen[m] = len(minutes)
+        minutes.append(m)
+        days.append(d)
+        n = int(table[m])
+        d += n <= m
+        m = n
+    mu = seen[m]
+    return np.array(minutes), np.array(days), mu, d - days[mu]
+
+
+def _first_on(orbit, offsets):
+    """
+    For each day offset, the first step landing on or after it:
+    returns (step is the start itself, minute, day offset) arrays.
+    """
+    minutes, days, mu, lap = orbit
+    offsets = np.asarray(offsets, dtype="int64")
+    lap_days = days[mu:] - days[mu]
 
-    last_start = df["start_time"].iloc[-1]
-    next_start = _roll_one_step(model, last_start)
-    duration = df["sleep_duration"].median()
-    wake = next_start + timedelta(hours=duration)
+    # before the cycle: plain search over the first steps
+    i = np.minimum(np.searchsorted(days[:mu + 1], offsets, "left"), mu)
+    # inside it: skip whole laps, then search one lap
+    r = offsets - days[mu]
+    laps = np.maximum(0, -(-(r - lap_days[-1]) // lap))
+    j = np.minimum(np.searchsorted(lap_days, r - laps * lap, "left"),
+                   len(lap_days) - 1)
 
+    pre = offsets <= days[mu]
+    minute = np.where(pre, minutes[i], minutes[mu:][j])
+    day = np.where(pre, days[i], days[mu] + laps * lap + lap_days[j])
+    return pre & (i == 0), minute, day
+
+
+def _forecast(fit, when):
+    """Result dict for a predicted sleep start `when`."""
+    wake = when + timedelta(hours=fit["duration"])
     return {
-        "date": next_start.date(),
-        "sleep": next_start.strftime("%H:%M"),
+        "date": when.date(),
+        "sleep": when.strftime("%H:%M"),
         "wake":  wake.strftime("%H:%M"),
-        "duration": round(duration, 2),
+        "duration": round(fit["duration"], 2),
     }
 
 
-def forecast_for_date(target_date):
-    model, df = _knn_model()
-    if model is None:
+@timed
+def next_sleep_forecast():
+    fit = _knn_model()
+    if fit["table"] is None:
         return {"error": "Need more non-empty rows first."}
 
-    cur = df["start_time"].iloc[-1]
-    while cur.date() < target_date:
-        cur = _roll_one_step(model, cur)
-    duration = df["sleep_duration"].median()
-    wake = cur + timedelta(hours=duration)
-    return {
-        "date": cur.date(),
-        "sleep": cur.strftime("%H:%M"),
-        "wake":  wake.strftime("%H:%M"),
-        "duration": round(duration, 2),
-    }
+    last_start = fit["last_start"]
+    last_min = last_start.hour * 60 + last_start.minute
+    next_min = int(fit["table"][last_min])
+    next_start = last_start.normalize() + timedelta(minutes=next_min)
+    if next_start <= last_start:
+        next_start += timedelta(days=1)
+    return _forecast(fit, next_start)
+
+
+@timed
+def forecast_range(start_date, end_date):
+    """
+    Forecast for every date in [start_date, end_date] in one vectorised
+    pass: DataFrame with date, sleep, wake and duration (h) per row.
+    """
+    fit = _knn_model()
+    if fit["table"] is None:
+        return {"error": "Need more non-empty rows first."}
+
+    last_start = fit["last_start"]
+    base = last_start.normalize()
+    dates = pd.date_range(start_date, end_date, freq="D")
+    orbit = _orbit(fit["table"], last_start.hour * 60 + last_start.minute)
+    is_last, minute, day = _first_on(orbit, (dates - base).days)
+
+    sleep = pd.Series(base + pd.to_timedelta(day, unit="D")
+                      + pd.to_timedelta(minute, unit="min"))
+    sleep[is_last] = last_start
+    wake = sleep + timedelta(hours=fit["duration"])
+    return pd.DataFrame({
+        "date": sleep.dt.date,
+        "sleep": hhmm(sleep),
+        "wake": hhmm(wake),
+        "duration": round(fit["duration"], 2),
+    })
+
+
+@timed
+def forecast_for_date(target_date):
+    result = forecast_range(target_date, target_date)
+    if isinstance(result, dict):
+        return result
+    return result.iloc[0].to_dict()
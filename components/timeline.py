@@ -0,0 +1,158 @@
+# components/timeline.py
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from utils.timeviews import floor_day, time_of_day, ymd
+
+if TYPE_CHECKING:                  # plotly is imported by the figure builders
+    import plotly.graph_objects as go
+
+# Every night is drawn on one dummy day, so the x-axis reads 00:00 → 24:00
+DUMMY = datetime(2025, 6, 1)
+DUMMY_END = DUMMY + timedelta(days=1)
+NOON = pd.Timedelta(hours=12)
+DAY = pd.Timedelta(days=1)
+
+# ── Zoom levels ───────────────────────────────────────────────────────────
+# One bar per night stops being readable (and gets heavy to ship to the
+# browser) after a couple of months; larger ranges are summarised per
+# week or month, so the figure size depends on the range, not the nights.
+RESOLUTIONS = {"Nights": None, "Weeks": "W", "Months": "M"}
+NIGHTS_MAX_DAYS = 60               # Auto: bars up to here …
+WEEKS_MAX_DAYS = 365               # … weekly bands up to here, then monthly
+BAR_HEIGHT = 40                    # px per date row in the nightly view
+BAND_HEIGHT = 480
+
+COLORS = ['#ade8f4', '#48cae4', '#0077b6']
+BG = '#1e1e2f'
+GRID = '#2e2e3f'
+
+
+def pick_resolution(n_days: int) -> str:
+    """Auto zoom level for a range of `n_days` dates."""
+    if n_days <= NIGHTS_MAX_DAYS:
+        return "Nights"
+    return "Weeks" if n_days <= WEEKS_MAX_DAYS else "Months"
+
+
+# ── Nightly bars ──────────────────────────────────────────────────────────
+def split_segments(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sleep sessions → timeline bars (Date, Sleep, Wake, Duration) on the
+    dummy day. A session whose wake time is not after its bedtime crosses
+    midnight and becomes two bars: bedtime → 24:00 on its own date and
+    00:00 → wake on the next one.
+    """
+    df = df.dropna(subset=["start_time", "end_time"])
+    s_tod = time_of_day(df["start_time"])
+    e_tod = time_of_day(df["end_time"])
+    date = floor_day(df["start_time"])
+    cross = e_tod <= s_tod
+    order = np.arange(len(df)) * 2            # keeps each pair together
+
+    first = pd.DataFrame({
+        "Date":     ymd(date),
+        "Sleep":    pd.Timestamp(DUMMY) + s_tod,
+        "Wake":     (pd.Timestamp(DUMMY) + e_tod).mask(cross, pd.Timestamp(DUMMY_END)),
+        "Duration": df["sleep_duration"],
+        "_order":   order,
+    })
+    second = pd.DataFrame({
+        "Date":     ymd((date + DAY)[cross]),
+        "Sleep":    pd.Timestamp(DUMMY),
+        "Wake":     pd.Timestamp(DUMMY) + e_tod[cross],
+        "Duration": df["sleep_duration"][cross],
+        "_order":   order[cross.to_numpy()] + 1,
+    })
+    return (pd.concat([first, second])
+              .sort_values("_order", kind="stable")
+              .drop(columns="_order")
+              .reset_index(drop=True))
+
+
+def timeline_figure(bars: pd.DataFrame) -> go.Figure:
+    """Plotly timeline of split_segments() bars, one row per date."""
+    import plotly.express as px
+    fig = px.timeline(
+        bars,
+        x_start="Sleep",
+        x_end="Wake",
+        y="Date",
+        color="Duration",
+        color_continuous_scale=COLORS,
+        template='plotly_dark',
+    )
+    fig.update_yaxes(autorange="reversed")
+    # clamp X-axis to 00:00→24:00
+    fig.update_xaxes(range=[DUMMY, DUMMY_END], tickformat="%H:%M",
+                     gridcolor=GRID)
+    return _style(fig, BAR_HEIGHT * max(bars["Date"].nunique(), 1))
+
+
+# ── Weekly / monthly bands ────────────────────────────────────────────────
+def night_bands(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """
+    Per period (`freq` "W" or "M"): median bedtime and wake time with
+    their 25 %/75 % quantiles, plus nights and median duration. Clock
+    times are measured from noon so a night is one contiguous range;
+    they come back as datetimes on the dummy day (noon → noon).
+    """
+    df = df.dropna(subset=["start_time", "end_time"])
+    secs = pd.DataFrame({
+        "bed":  ((time_of_day(df["start_time"]) - NOON) % DAY).dt.total_seconds(),
+        "wake": ((time_of_day(df["end_time"]) - NOON) % DAY).dt.total_seconds(),
+    })
+    period = df["start_time"].dt.to_period(freq).dt.start_time.rename("Period")
+    grouped = secs.groupby(period)
+
+    q = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    out = pd.DataFrame(index=q.index)
+    for col in ("bed", "wake"):
+        for p, name in ((0.25, "q25"), (0.5, "median"), (0.75, "q75")):
+            out[f"{col}_{name}"] = (pd.Timestamp(DUMMY) + NOON
+                                    + pd.to_timedelta(q[(col, p)], unit="s"))
+    out["nights"] = grouped.size()
+    out["duration"] = (df["sleep_duration"].astype("float64")
+                       .groupby(period).median())
+    return out.reset_index()
+
+
+def band_figure(bands: pd.DataFrame, label: str) -> go.Figure:
+    """Median bed/wake lines per period with the 25–75 % range shaded."""
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    for col, name, color, fill in (
+            ("bed", "Bedtime", COLORS[1], "rgba(72,202,228,0.25)"),
+            ("wake", "Wake", COLORS[0], "rgba(173,232,244,0.25)")):
+        fig.add_trace(go.Scatter(
+            x=bands["Period"], y=bands[f"{col}_q75"], mode="lines",
+            line=dict(width=0), hoverinfo="skip", showlegend=False))
+        fig.add_trace(go.Scatter(
+            x=bands["Period"], y=bands[f"{col}_q25"], mode="lines",
+            line=dict(width=0), fill="tonexty", fillcolor=fill,
+            hoverinfo="skip", name=f"{name} 25–75 %"))
+        fig.add_trace(go.Scatter(
+            x=bands["Period"], y=bands[f"{col}_median"], mode="lines+markers",
+            line=dict(color=color), name=f"{name} (median)",
+            customdata=bands[["nights", "duration"]],
+            hovertemplate=(f"{label} of %{{x|%Y-%m-%d}}<br>{name}: %{{y|%H:%M}}"
+                           "<br>%{customdata[0]} nights, median "
+                           "%{customdata[1]:.2f} h<extra></extra>")))
+    fig.update_layout(template='plotly_dark')
+    fig.update_yaxes(range=[DUMMY_END + NOON, DUMMY + NOON], tickformat="%H:%M",
+                     gridcolor=GRID)
+    fig.update_xaxes(gridcolor=GRID)
+    return _style(fig, BAND_HEIGHT)
+
+
+def _style(fig: go.Figure, height: int) -> go.Figure:
+    fig.update_layout(
+        paper_bgcolor=BG,
+        plot_bgcolor=BG,
+        font_color='#ffffff',
+        margin=dict(l=20, r=20, t=40, b=20),
+        height=height,
+    )
+    return fig
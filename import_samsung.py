@@ -0,0 +1,24 @@
+import argparse
+import sys
+from utils.samsung import import_export
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Import a Samsung Health export folder or zip '
+                    '(sleep, heart rate, stress).')
+    parser.add_argument('path', help='export folder or .zip')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true',
+                        help='ignore the last import and re-read every row')
+    args = parser.parse_args()
+
+    try:
+        report = import_export(args.path, args.workers, args.force)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    for kind, r in report.items():
+        print(f"{kind:<10} {r['files']} file(s), {r['rows']} new rows, "
+              f"{r['added']} written")
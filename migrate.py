@@ -0,0 +1,14 @@
+import sys
+from utils.data_io import LOG_PATH, migrate
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (1, 2) or sys.argv[1:] not in ([], ['--force']):
+        print('Usage: python migrate.py [--force]')
+        sys.exit(1)
+    # Copies the existing CSV data into the columnar log (SLEEP_STORAGE)
+    n = migrate(force='--force' in sys.argv)
+    if n:
+        print(f"Migrated {n} rows into: {LOG_PATH}")
+    else:
+        print(f"Nothing to migrate – {LOG_PATH} already holds data.")
@@ -1,32 +1,66 @@
 # pages/1_📥_Input.py
+import tempfile
 import streamlit as st
-from utils import import_external, append
+from utils import import_external, import_external_stream
 from components.sleep_form import sleep_entry_form
 from utils.auth import check_password
+from utils.samsung import import_export
+from utils.perf import page_run
+from utils.prewarm import prewarm
 
-st.title("📥 Input")
+STREAM_UPLOAD_BYTES = 20 * 1024 * 1024    # stream uploads bigger than this
 
-up = st.file_uploader(
-    "Upload cleaned CSV (date_only, start_time, end_time, …)", type="csv"
-)
-if up:
-    # ➊ Ask for password immediately on upload
-    if not check_password("import-cleaned", prompt="🔒 Password to import"):
-        st.stop()
+with page_run("Input"):
+    st.title("📥 Input")
 
-    # ➋ Parse and write
-    df_new = import_external(up)
+    up = st.file_uploader(
+        "Upload cleaned CSV (date_only, start_time, end_time, …)", type="csv"
+    )
+    if up:
+        # ➊ Ask for password immediately on upload
+        if not check_password("import-cleaned", prompt="🔒 Password to import"):
+            st.stop()
 
-    # ➌ Debug output: inspect what got parsed
-    st.subheader("Parsed upload preview")
-    st.dataframe(df_new.head(10))
+        # ➋ Parse and merge (big files are streamed in chunks); rows already
+        #    in the log are skipped, so re-uploading a backup is harmless
+        if up.size > STREAM_UPLOAD_BYTES:
+            counts = import_external_stream(up)
+        else:
+            df_new, counts = import_external(up)
 
-    # ➍ Confirm success
-    st.success(f"Imported {len(df_new)} rows into sleep_log.csv")
+            # ➌ Debug output: inspect what got parsed
+            st.subheader("Parsed upload preview")
+            st.dataframe(df_new.head(10))
 
+        # ➍ Confirm success
+        st.success("Sleep log: {} new, {} changed, {} already there".format(*counts))
 
-st.divider()
+    # ---------- Samsung Health export -------------------------------------------
+    export = st.file_uploader(
+        "Upload a Samsung Health export (.zip) – only new data is imported",
+        type="zip",
+    )
+    if export:
+        if not check_password("import-samsung", prompt="🔒 Password to import"):
+            st.stop()
 
-# ---------- Manual entry ----------------------------------------------------
-# sleep_entry_form will call check_password() ONLY when user clicks Save.
-sleep_entry_form()
+        # the importer reads the zip from disk, in worker processes
+        with tempfile.NamedTemporaryFile(suffix=".zip") as tmp:
+            tmp.write(export.getbuffer())
+            tmp.flush()
+            try:
+                with st.spinner("Importing export…"):
+                    report = import_export(tmp.name)
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+        st.success("Imported: " + ", ".join(
+            f"{kind} {r['added']}" for kind, r in report.items()))
+
+    st.divider()
+
+    # ---------- Manual entry ----------------------------------------------------
+    # sleep_entry_form will call check_password() ONLY when user clicks Save.
+    sleep_entry_form()
+
+prewarm()
@@ -2,7 +2,10 @@
 import streamlit as st
 from datetime import datetime, date, timedelta
 from zoneinfo import ZoneInfo
-from components.ml_predictor import next_sleep_forecast, forecast_for_date
+from components.ml_predictor import (next_sleep_forecast, forecast_for_date,
+                                     forecast_range)
+from utils.perf import page_run
+from utils.prewarm import prewarm
 
 # ——————————————————————————————————————————————————————————————————————————
 # Configuration
@@ -10,29 +13,52 @@ from components.ml_predictor import next_sleep_forecast, forecast_for_date
 tz = ZoneInfo("Asia/Taipei")
 today = datetime.now(tz).date()
 
-st.title("🔮 Sleep Prediction")
-
-
-# ── Date picker ─────────────────────────────────────────────────────────────
-sel_date = st.date_input(
-    "Select a future date",
-    value=today + timedelta(days=1),
-    min_value=today + timedelta(days=1),
-    help="Pick tomorrow or any later date to see the forecast."
-)
-
-# ── Compute forecast ───────────────────────────────────────────────────────
-if sel_date == today + timedelta(days=1):
-    result = next_sleep_forecast()
-else:
-    result = forecast_for_date(sel_date)
-
-# ── Display ────────────────────────────────────────────────────────────────
-if "error" in result:
-    st.info(result["error"])
-else:
-    st.subheader(f"Forecast for **{result['date']}**")
-    c1, c2, c3 = st.columns(3)
-    c1.metric("Sleep time", result["sleep"])
-    c2.metric("Wake time",  result["wake"])
-    c3.metric("Duration (h)", result["duration"])
+with page_run("Prediction"):
+    st.title("🔮 Sleep Prediction")
+
+
+    # ── Date picker ─────────────────────────────────────────────────────────────
+    sel_date = st.date_input(
+        "Select a future date",
+        value=today + timedelta(days=1),
+        min_value=today + timedelta(days=1),
+        help="Pick tomorrow or any later date to see the forecast."
+    )
+
+    # ── Compute forecast ───────────────────────────────────────────────────────
+    if sel_date == today + timedelta(days=1):
+        result = next_sleep_forecast()
+    else:
+        result = forecast_for_date(sel_date)
+
+    # ── Display ────────────────────────────────────────────────────────────────
+    if "error" in result:
+        st.info(result["error"])
+    else:
+        st.subheader(f"Forecast for **{result['date']}**")
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Sleep time", result["sleep"])
+        c2.metric("Wake time",  result["wake"])
+        c3.metric("Duration (h)", result["duration"])
+
+    # ── Multi-day forecast ─────────────────────────────────────────────────────
+    st.divider()
+    st.subheader("📅 Next days")
+    horizon = st.slider("Days ahead", 1, 90, 14)
+    table = forecast_range(today + timedelta(days=1), today + timedelta(days=horizon))
+    if isinstance(table, dict):
+        st.info(table["error"])
+    else:
+        st.dataframe(
+            table,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "date":     st.column_config.DateColumn("Date"),
+                "sleep":    "Sleep time",
+                "wake":     "Wake time",
+                "duration": st.column_config.NumberColumn("Duration (h)", format="%.2f"),
+            },
+        )
+
+prewarm()
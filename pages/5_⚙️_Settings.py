@@ -1,116 +1,183 @@
 # pages/4_⚙️_Settings.py
-from utils.data_io import load
 import pathlib
 import os
 import io
 import pandas as pd
 import streamlit as st
-from utils.data_io import DATA_PATH, load, append
+from utils.data_io import LOG_PATH, log_files, import_external, clear
+from utils.rollups import totals
+from utils.exports import FORMATS, cached, export, file_name
+from utils.snapshots import restore, snapshots
 from utils.auth import check_password
 from zoneinfo import ZoneInfo
+from utils import perf
+from utils.perf import page_run
+from utils.prewarm import prewarm
 
 st.set_page_config(page_title="Settings")
-
-tz = ZoneInfo("Asia/Taipei")
-
-# ------------------------------------------------------------------ #
-# 1. Data overview                                                   #
-# ------------------------------------------------------------------ #
-st.header("🗄️  Data overview")
-
-if DATA_PATH.exists():
-    df = load()
-    rows = len(df)
-    file_sz = DATA_PATH.stat().st_size / 1024
-    st.write(
-        f"**File:** `{DATA_PATH}`  |  **Rows:** {rows}  |  **Size:** {file_sz:.1f} kB")
-else:
-    st.warning(
-        "`sleep_log.csv` not found – a new one will be created on first save.")
-    df = pd.DataFrame()
-
-st.divider()
-
-# ------------------------------------------------------------------ #
-# 2. Download backup                                                 #
-# ------------------------------------------------------------------ #
-st.subheader("📥  Download backup")
-
-# 1) Load existing data (tz-naïve local times)
-df = load()
-
-# 2) Define a naïve start & end
-START = pd.Timestamp("2025-01-01")                       # naïve
-END = pd.Timestamp.now(ZoneInfo("Asia/Taipei"))        # tz-aware
-END = END.normalize().tz_localize(None)                # strip tz → naïve
-
-# 3) Build full calendar
-dates = pd.date_range(START, END, freq="D")
-calendar = pd.DataFrame({"date_only": dates})
-
-# 4) Pull in your existing first-per-day rows
-df_exist = df.copy()
-df_exist["date_only"] = df_exist["start_time"].dt.normalize()
-keep = ["date_only", "start_time", "end_time",
-        "physical_recovery", "mental_recovery",
-        "sleep_cycle", "sleep_score", "sleep_duration"]
-df_exist = (
-    df_exist
-    .sort_values("start_time")
-    .drop_duplicates("date_only", keep="first")
-    [keep]
-)
-
-# 5) Merge so gaps stay blank
-template = calendar.merge(df_exist, on="date_only", how="left")
-
-# 6) Format times as HH:MM strings
-for c in ("start_time", "end_time"):
-    template[c] = template[c].dt.strftime("%H:%M").fillna("")
-
-# 7) Offer for download
-csv = template.to_csv(index=False)
-st.download_button(
-    "⬇️ Download 2025-template for Sheets",
-    csv,
-    file_name="sleep_2025_template.csv",
-    mime="text/csv",
-)
-
-# ------------------------------------------------------------------ #
-# 3. Upload / merge backup (password-gated)                          #
-# ------------------------------------------------------------------ #
-st.subheader("📤  Upload & merge")
-up_file = st.file_uploader("Choose a CSV previously exported by this app",
-                           type=["csv"])
-
-if up_file:
-    if check_password("settings-upload", prompt="🔒 Password to import"):
-        try:
-            new_df = pd.read_csv(up_file)
-            append(new_df)
-            st.success(f"Merged {len(new_df)} additional rows.")
-            st.rerun()
-        except Exception as e:
-            st.error(f"Import failed: {e}")
-
-st.divider()
-
-# ------------------------------------------------------------------ #
-# 4. Danger zone – clear ALL data                                    #
-# ------------------------------------------------------------------ #
-st.subheader("💥  Danger zone")
-st.markdown(
-    ":warning: **Delete ALL records** – this cannot be undone "
-    "(unless you kept a backup above)."
-)
-
-if st.button("Delete sleep_log.csv"):
-    if check_password("settings-clear", prompt="🔒 Confirm password to delete"):
-        try:
-            DATA_PATH.unlink(missing_ok=True)
-            st.success(
-                "File deleted. A fresh log will be created on next save.")
+with page_run("Settings"):
+
+    tz = ZoneInfo("Asia/Taipei")
+
+    # ------------------------------------------------------------------ #
+    # 1. Data overview                                                   #
+    # ------------------------------------------------------------------ #
+    st.header("🗄️  Data overview")
+
+    files = log_files()
+    if files:
+        rows = totals()["nights"]
+        file_sz = sum(p.stat().st_size for p in files if p.exists()) / 1024
+        st.write(
+            f"**Files:** `{LOG_PATH}` ({len(files)})  |  **Rows:** {rows}  |  **Size:** {file_sz:.1f} kB")
+    else:
+        st.warning(
+            f"`{LOG_PATH.name}` not found – a new one will be created on first save.")
+
+    st.divider()
+
+    # ------------------------------------------------------------------ #
+    # 2. Download backup                                                 #
+    # ------------------------------------------------------------------ #
+    st.subheader("📥  Download backup")
+
+    # Files are only built when asked for, then kept until the log changes
+    today = pd.Timestamp.now(tz).tz_localize(None).normalize()
+    c1, c2 = st.columns(2)
+    fmt = c1.selectbox("Format", list(FORMATS),
+                       format_func=lambda f: FORMATS[f][0])
+    picked = c2.date_input("Dates", value=(today.replace(month=1, day=1), today),
+                           max_value=today)
+    if len(picked) == 2:
+        first, last = map(pd.Timestamp, picked)
+        bounds = (first, last + pd.Timedelta(days=1))      # end exclusive
+        data = cached(fmt, *bounds)
+        if data is None and st.button("Prepare download"):
+            with st.spinner("Building the file…"):
+                data = export(fmt, *bounds)
+        if data is not None:
+            st.download_button(
+                f"⬇️ Download {FORMATS[fmt][0]}",
+                data,
+                file_name=file_name(fmt, *bounds),
+                mime=FORMATS[fmt][2],
+                on_click="ignore",
+            )
+    else:
+        st.caption("Pick the last day of the range too.")
+
+    # ------------------------------------------------------------------ #
+    # 3. Upload / merge backup (password-gated)                          #
+    # ------------------------------------------------------------------ #
+    st.subheader("📤  Upload & merge")
+    up_file = st.file_uploader("Choose a CSV previously exported by this app",
+                               type=["csv"])
+
+    if up_file:
+        if check_password("settings-upload", prompt="🔒 Password to import"):
+            try:
+                # parsed like the Input page's import (HH:MM + date_only),
+                # rows already in the log are skipped – re-uploading is harmless
+                _, (added, changed, same) = import_external(up_file)
+                st.success(f"Merged: {added} new, {changed} changed, "
+                           f"{same} already in the log.")
+            except Exception as e:
+                st.error(f"Import failed: {e}")
+
+    st.divider()
+
+    # ------------------------------------------------------------------ #
+    # 4. Performance – opt-in timings of data & model calls              #
+    # ------------------------------------------------------------------ #
+    st.subheader("⏱️  Performance")
+    c1, c2 = st.columns(2)
+    record = c1.toggle("Record timings", value=perf.ENABLED,
+                       help="Times every data_io / predictor call and page rerun.")
+    memory = c2.toggle("Track peak memory", value=perf.MEMORY,
+                       help="tracemalloc – noticeably slows everything down.")
+    if record and (not perf.ENABLED or memory != perf.MEMORY):
+        perf.enable(memory)
+    elif not record and perf.ENABLED:
+        perf.disable()
+
+    stats = perf.summary()
+    if stats.empty:
+        st.caption("No traces yet – turn recording on and use the app.")
+    else:
+        st.dataframe(
+            stats,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "p50_ms":  st.column_config.NumberColumn("p50 (ms)", format="%.1f"),
+                "p95_ms":  st.column_config.NumberColumn("p95 (ms)", format="%.1f"),
+                "max_ms":  st.column_config.NumberColumn("max (ms)", format="%.1f"),
+                "rows":    st.column_config.NumberColumn("rows (median)", format="%.0f"),
+                "peak_kb": st.column_config.NumberColumn("peak (kB)", format="%.0f"),
+            },
+        )
+        c1, c2 = st.columns(2)
+        c1.download_button("⬇️ Export traces (JSON)", perf.export_json(),
+                           file_name="sleep_app_traces.json",
+                           mime="application/json")
+        if c2.button("Clear traces"):
+            perf.clear()
             st.rerun()
-        except Exception as e:
-            st.error(f"Delete failed: {e}")
+
+    st.divider()
+
+    # ------------------------------------------------------------------ #
+    # 5. Snapshots – point-in-time restore (password-gated)              #
+    # ------------------------------------------------------------------ #
+    st.subheader("🕰️  Snapshots")
+    st.caption("Taken automatically before every save, import, overwrite "
+               "and delete. Only the changed rows are stored.")
+    snaps = snapshots()[::-1]                  # newest first
+    if not snaps:
+        st.caption("No snapshots yet.")
+    else:
+        st.dataframe(
+            pd.DataFrame(snaps)[["id", "time", "reason", "kind", "rows",
+                                 "added", "removed", "bytes"]],
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "bytes": st.column_config.NumberColumn("size (B)", format="%d"),
+            },
+        )
+        labels = {e["id"]: f"#{e['id']}  {e['time']}  ({e['reason']}, "
+                           f"{e['rows']} rows)" for e in snaps}
+        sid = st.selectbox("Restore the log as it was before", list(labels),
+                           format_func=labels.get)
+        if st.button("Restore snapshot"):
+            if check_password("settings-restore", prompt="🔒 Password to restore"):
+                try:
+                    with st.spinner("Rebuilding…"):
+                        rows = restore(sid)
+                    st.success(f"Restored snapshot #{sid} ({rows} rows). "
+                               "The state before it was snapshotted too.")
+                except Exception as e:
+                    st.error(f"Restore failed: {e}")
+
+    st.divider()
+
+    # ------------------------------------------------------------------ #
+    # 6. Danger zone – clear ALL data                                    #
+    # ------------------------------------------------------------------ #
+    st.subheader("💥  Danger zone")
+    st.markdown(
+        ":warning: **Delete ALL records** – a snapshot is taken first, so "
+        "it can be undone under Snapshots above."
+    )
+
+    if st.button("Delete the sleep log"):
+        if check_password("settings-clear", prompt="🔒 Confirm password to delete"):
+            try:
+                clear()
+                st.success(
+                    "File deleted. A fresh log will be created on next save.")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Delete failed: {e}")
+
+prewarm()
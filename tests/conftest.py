@@ -0,0 +1,29 @@
+# tests/conftest.py
+import importlib
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def reload_utils():
+    """Fresh utils.* modules, so path/env constants are read again."""
+    for name in [m for m in sys.modules if m.startswith("utils")]:
+        del sys.modules[name]
+    return importlib.import_module("utils.data_io")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """
+    utils.data_io (+ rollups / row_index) working in an empty temporary
+    data/ folder, without the legacy archive or snapshots.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SLEEP_LEGACY_JSON", "")
+    monkeypatch.setenv("SLEEP_SNAPSHOTS", "0")
+    monkeypatch.setenv("SLEEP_GROUP_COMMIT_MS", "0")
+    yield reload_utils()
+    reload_utils()
@@ -0,0 +1,76 @@
+# tests/test_legacy.py
+import json
+import pandas as pd
+import pytest
+from conftest import reload_utils
+
+ARCHIVE = {"sleep_record": [
+    {"date": {"year": 2022, "month": "02", "day": "01"},
+     "sleep": {"hour": "01", "min": "00"},
+     "wake": {"hour": "08", "min": "30"}, "duration": 7.5},
+    {"date": {"year": 2023, "month": "03", "day": "05"},
+     "sleep": {"hour": "23", "min": "15"},
+     "wake": {"hour": "06", "min": "45"}, "duration": 7.5},
+]}
+
+
+def _with_archive(tmp_path, monkeypatch):
+    path = tmp_path / "archive.json"
+    path.write_text(json.dumps(ARCHIVE))
+    monkeypatch.setenv("SLEEP_LEGACY_JSON", str(path))
+    return reload_utils()
+
+
+def test_archive_is_shown_but_never_written(store, tmp_path, monkeypatch):
+    data_io = _with_archive(tmp_path, monkeypatch)
+    assert len(data_io.load()) == 2
+
+    start = pd.Timestamp("2025-01-01 23:00")
+    data_io.append(pd.DataFrame({"start_time": [start],
+                                 "end_time": [start + pd.Timedelta(hours=8)]}))
+    edited = data_io.load().iloc[[0]].assign(sleep_score=90)
+    data_io.upsert(edited)                      # edit an archive row
+    shown = data_io.load()
+    assert len(shown) == 3
+    assert shown.iloc[0]["sleep_score"] == 90
+
+    stored = pd.concat([pd.read_parquet(p) for p in data_io.log_files()])
+    assert len(stored) == 2                     # the new night + the edit
+
+    data_io.clear()
+    assert len(data_io.load()) == 2             # archive only
+
+    monkeypatch.setenv("SLEEP_LEGACY_JSON", "")
+    assert len(reload_utils().load()) == 0
+
+
+def test_migrate_leaves_the_archive_out(store, tmp_path, monkeypatch):
+    store.DATA_DIR.mkdir()
+    start = pd.Timestamp("2024-06-01 23:00")
+    pd.DataFrame({"start_time": [start],
+                  "end_time": [start + pd.Timedelta(hours=7)]}
+                 ).reindex(columns=store.COLUMNS).to_csv(store.DATA_PATH,
+                                                        index=False)
+    data_io = _with_archive(tmp_path, monkeypatch)
+    assert data_io.migrate() == 1
+    monkeypatch.setenv("SLEEP_LEGACY_JSON", "")
+    assert len(reload_utils().load()) == 1
+
+
+def test_midnight_splits_are_one_sleep(store, tmp_path, monkeypatch):
+    def record(day, sleep, wake):
+        return {"date": {"year": 2022, "month": "02", "day": day},
+                "sleep": dict(zip(["hour", "min"], sleep.split(":"))),
+                "wake": dict(zip(["hour", "min"], wake.split(":"))),
+                "duration": 5.2}
+    path = tmp_path / "archive.json"
+    path.write_text(json.dumps({"sleep_record": [
+        record("01", "22:45", "23:59"), record("02", "00:00", "04:04"),
+        record("02", "13:00", "14:00"),
+    ]}))
+    monkeypatch.setenv("SLEEP_LEGACY_JSON", str(path))
+    df = reload_utils().load()
+    assert list(df["start_time"]) == [pd.Timestamp("2022-02-01 22:45"),
+                                      pd.Timestamp("2022-02-02 13:00")]
+    assert df["end_time"].iloc[0] == pd.Timestamp("2022-02-02 04:04")
+    assert df["sleep_duration"].iloc[0] == pytest.approx(5.32)
@@ -0,0 +1,34 @@
+# tests/test_rollups.py
+import pandas as pd
+
+
+def _night(day: str) -> pd.DataFrame:
+    start = pd.Timestamp(f"{day} 23:00")
+    return pd.DataFrame({"start_time": [start],
+                         "end_time": [start + pd.Timedelta(hours=8)],
+                         "sleep_duration": [8.0]})
+
+
+def test_first_append_into_empty_store(store):
+    from utils.rollups import rollup
+    store.append(_night("2025-01-01"))          # no tables built yet
+    assert len(store.load()) == 1
+    assert rollup("day")["nights"].sum() == 1
+
+
+def test_append_after_clear(store):
+    from utils.rollups import rollup
+    store.append(_night("2025-01-01"))
+    rollup("day")
+    store.clear()
+    store.append(_night("2025-01-02"))
+    assert len(store.load()) == 1
+    assert list(rollup("day").index) == [pd.Timestamp("2025-01-02")]
+
+
+def test_empty_store(store):
+    from utils.rollups import first_per_day, rollup, totals
+    assert store.data_version() is None         # no log, no archive
+    assert totals() == {"nights": 0, "duration_mean": None}
+    assert rollup("day").empty
+    assert first_per_day().empty
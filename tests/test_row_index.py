@@ -0,0 +1,28 @@
+# tests/test_row_index.py
+import io
+import pandas as pd
+
+
+def test_reimporting_a_template_adds_nothing(store):
+    from utils.exports import export
+    store.append(pd.DataFrame({
+        "start_time": pd.to_datetime(["2025-01-01 23:10", "2025-01-03 00:30"]),
+        "end_time": pd.to_datetime(["2025-01-02 07:00", "2025-01-03 08:15"]),
+        "sleep_score": [80, 72],
+    }))
+    template = export("template", "2025-01-01", "2025-01-11")   # 8 blank days
+
+    _, first = store.import_external(io.BytesIO(template))
+    rows = len(store.load())
+    _, second = store.import_external(io.BytesIO(template))
+
+    assert len(store.load()) == rows == 2
+    assert second[:2] == (0, 0)
+
+
+def test_first_import_into_empty_store(store):
+    csv = b"start_time,end_time,sleep_score\n2025-01-01 23:10,2025-01-02 07:00,80\n"
+    assert store.data_version() is None
+    _, counts = store.import_external(io.BytesIO(csv))
+    assert counts == (1, 0, 0)
+    assert len(store.load()) == 1
@@ -0,0 +1,22 @@
+# tests/test_snapshots.py
+import io
+import pandas as pd
+from conftest import reload_utils
+
+
+def test_streamed_import_takes_one_snapshot(store, monkeypatch):
+    monkeypatch.setenv("SLEEP_SNAPSHOTS", "1")
+    data_io = reload_utils()
+    from utils.snapshots import snapshots
+    start = pd.Timestamp("2025-01-01 23:00")
+    data_io.append(pd.DataFrame({"start_time": [start],
+                                 "end_time": [start + pd.Timedelta(hours=8)]}))
+
+    days = pd.date_range("2025-02-01 23:00", periods=5, freq="D")
+    csv = pd.DataFrame({"start_time": days,
+                        "end_time": days + pd.Timedelta(hours=7),
+                        "sleep_score": 80}).to_csv(index=False).encode()
+    counts = data_io.import_external_stream(io.BytesIO(csv), chunksize=2)
+
+    assert counts == (5, 0, 0)
+    assert [(e["reason"], e["rows"]) for e in snapshots()] == [("import", 1)]
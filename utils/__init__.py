@@ -1 +1,2 @@
-from .data_io import load, append, import_external
+from .data_io import (load, append, upsert, merge_rows, import_external,
+                      import_external_stream, overwrite, invalidate_cache)
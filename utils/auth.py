@@ -2,11 +2,10 @@
 import streamlit as st
 from hashlib import sha256
 
-HASH = st.secrets["PWD_HASH"]
-
 
 def _hash_ok(pwd: str) -> bool:
-    return sha256(pwd.encode()).hexdigest() == HASH
+    # secrets are read on the first password check, not at import time
+    return sha256(pwd.encode()).hexdigest() == st.secrets["PWD_HASH"]
 
 
 def check_password(action: str,
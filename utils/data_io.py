@@ -1,15 +1,53 @@
 # utils/data_io.py
+import os
+import shutil
+import threading
+import time
 from pathlib import Path
 from zoneinfo import ZoneInfo
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import timedelta
+from .storage import get_format, format_for
+from .locking import file_lock, atomic_write
+from .perf import timed
+from .data_loader import load_sleep_data
 
 # ── Constants & paths ─────────────────────────────────────────────────────
 TZ = ZoneInfo("Asia/Taipei")                  # local zone
 DATA_DIR = Path("data")
-DATA_PATH = DATA_DIR / "sleep_log.csv"
+DATA_PATH = DATA_DIR / "sleep_log.csv"                 # legacy / CSV log
 SAMSUNG_CSV = DATA_DIR / "samsung_health_sleep_combined_data.csv"
 CLEANED_CSV = Path("cleaned_sleep_data_2025.csv")      # your filled template
+JOURNAL_DIR = DATA_DIR / "sleep_log.journal"           # append-only segments
+PARTS_DIR = DATA_DIR / "sleep_log.parts"               # base log, one file a year
+LOCK_PATH = DATA_DIR / "sleep_log.lock"                # held by every writer
+
+# On-disk format of the log: "parquet" (default), "feather", "csv" or
+# "sqlite" (indexed upserts instead of journal + compaction)
+STORAGE = os.environ.get("SLEEP_STORAGE", "parquet")
+FORMAT = get_format(STORAGE)
+STORE_PATH = DATA_DIR / f"sleep_log{FORMAT.suffix}"
+LOG_BASES = {STORE_PATH, DATA_PATH}   # store + CSV log it was migrated from
+# Journaled formats keep the base log as one file per start_time year in
+# PARTS_DIR (rows without a start_time in UNDATED), so a date-ranged
+# load() only reads the years it needs. A single STORE_PATH file from
+# before partitioning is still read, and split up on the next rewrite.
+LOG_PATH = PARTS_DIR if FORMAT.journaled else STORE_PATH
+UNDATED = "undated"
+# Hand-kept 2022–2024 archive, streamed in (utils.data_loader) behind the
+# log: read-only, and rows the log also holds are shown from the log.
+# SLEEP_LEGACY_JSON="" hides it.
+LEGACY_JSON = Path(os.environ.get("SLEEP_LEGACY_JSON",
+                                  DATA_DIR / "sleep_data.json"))
+
+SEGMENT_BYTES = 64 * 1024          # roll over to a new segment past this
+COMPACT_SEGMENTS = 8               # merge the journal into the base file at
+COMPACT_BYTES = 512 * 1024         # either of these thresholds
+IMPORT_CHUNK_ROWS = 50_000         # rows per chunk in import_external_stream
+# append()/upsert() calls arriving within this window share one flush
+GROUP_COMMIT_S = float(os.environ.get("SLEEP_GROUP_COMMIT_MS", "20")) / 1000
+READ_RETRIES = 3
 
 COLUMNS = [
     "start_time", "end_time",
@@ -17,22 +55,44 @@ COLUMNS = [
     "sleep_cycle", "sleep_score",
     "sleep_duration", "create_time", "update_time"
 ]
+DT_COLS = ["start_time", "end_time", "create_time", "update_time"]
+KEY_COLS = ["start_time", "end_time"]          # identity of one sleep
+VALUE_COLS = ["physical_recovery", "mental_recovery",
+              "sleep_cycle", "sleep_score", "sleep_duration"]
+
+# Compact in-memory dtypes for the cached frame (nullable: blanks stay <NA>)
+SMALL_INT_COLS = ["physical_recovery", "mental_recovery",
+                  "sleep_cycle", "sleep_score"]
+DURATION_DTYPE = "float32"
+
+# Process-wide cache shared by every Streamlit session:
+# {((path, mtime_ns, size), …): DataFrame}
+_CACHE: dict = {}
+_CACHE_LOCK = threading.Lock()
+_PARTS: dict = {}                  # parsed base/segment files by file id
+
+_COMPACT_LOCK = threading.Lock()   # one background compaction at a time
+_FLUSH_LOCK = threading.Lock()     # held by the caller flushing a group
+_PENDING: list = []                # queued writes, see _submit()
+_PENDING_LOCK = threading.Lock()
 
 # ── Helpers ────────────────────────────────────────────────────────────────
 
 
+@timed(name="tz.localise")
 def _localise(df: pd.DataFrame, cols) -> pd.DataFrame:
     """Assign Asia/Taipei tz to naïve timestamps, then strip tz."""
     for c in cols:
         if c in df.columns:
             df[c] = (
                 pd.to_datetime(df[c], errors="coerce")
-                .dt.tz_localize(TZ, nonexistent="shift_forward", ambiguous="NaT")
+                .dt.tz_localize(TZ.key, nonexistent="shift_forward", ambiguous="NaT")
                 .dt.tz_localize(None)
             )
     return df
 
 
+@timed(name="tz.utc_to_local")
 def _utc_to_local(df: pd.DataFrame, cols) -> pd.DataFrame:
     """Convert naïve UTC timestamps → Asia/Taipei, then strip tz."""
     for c in cols:
@@ -40,7 +100,7 @@ def _utc_to_local(df: pd.DataFrame, cols) -> pd.DataFrame:
             df[c] = (
                 pd.to_datetime(df[c], errors="coerce")
                 .dt.tz_localize("UTC")
-                .dt.tz_convert(TZ)
+                .dt.tz_convert(TZ.key)
                 .dt.tz_localize(None)
             )
     return df
@@ -53,22 +113,215 @@ def _normalise_duration(df: pd.DataFrame) -> pd.DataFrame:
         df.loc[mask, "sleep_duration"] = df.loc[mask, "sleep_duration"] / 60.0
     return df
 
-# ── Public API ────────────────────────────────────────────────────────────
 
+def _compact(df: pd.DataFrame) -> pd.DataFrame:
+    """Shrink scores/cycles to UInt8 and duration to float32."""
+    for c in SMALL_INT_COLS:
+        if c in df.columns:
+            s = pd.to_numeric(df[c], errors="coerce").round()
+            df[c] = s.where(s.between(0, 255)).astype("UInt8")
+    if "sleep_duration" in df.columns:
+        df["sleep_duration"] = pd.to_numeric(
+            df["sleep_duration"], errors="coerce").astype(DURATION_DTYPE)
+    return df
+
+
+def _file_id(path: Path):
+    """(path, mtime_ns, size) – changes whenever the file is rewritten."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+def _segments(base: Path = STORE_PATH) -> list[Path]:
+    """Journal segments of a log base file, oldest first."""
+    if not JOURNAL_DIR.exists() or not format_for(base).journaled:
+        return []
+    return sorted(JOURNAL_DIR.glob(f"*{format_for(base).suffix}"))
+
+
+def _next_segment(segs: list[Path]) -> Path:
+    n = int(segs[-1].stem) + 1 if segs else 1
+    return JOURNAL_DIR / f"{n:06d}{FORMAT.suffix}"
+
+
+def _active_segment() -> Path:
+    """Segment the next append goes to (rolls over when full)."""
+    segs = _segments()
+    if FORMAT.appendable and segs and segs[-1].stat().st_size < SEGMENT_BYTES:
+        return segs[-1]
+    return _next_segment(segs)
+
+
+def _partition_path(label: str) -> Path:
+    return PARTS_DIR / f"{label}{FORMAT.suffix}"
 
-def load() -> pd.DataFrame:
+
+def _partition_labels(start: pd.Series) -> pd.Series:
+    """Partition of each row: its start_time year, UNDATED for NaT."""
+    return start.dt.year.astype("Int64").astype("string").fillna(UNDATED)
+
+
+def _base_files(base: Path = STORE_PATH) -> list[Path]:
+    """Files holding a log base: year partitions (+ an unsplit base file)."""
+    if base != STORE_PATH or not FORMAT.journaled or not PARTS_DIR.exists():
+        return [base]
+    return sorted(PARTS_DIR.glob(f"*{FORMAT.suffix}")) + [base]
+
+
+def _in_range(fid, start=None, end=None) -> bool:
+    """Could the file named by `fid` hold start_times in [start, end)?"""
+    path = Path(fid[0])
+    if path.parent != PARTS_DIR:
+        return True                 # journal segment or unsplit base file
+    if path.stem == UNDATED:
+        return False                # NaT never falls inside a range
+    year = int(path.stem)
+    return ((start is None or year >= pd.Timestamp(start).year)
+            and (end is None or pd.Timestamp(year, 1, 1) < pd.Timestamp(end)))
+
+
+def _legacy() -> list[Path]:
+    """[LEGACY_JSON] when the archive is there, else []."""
+    return [LEGACY_JSON] if LEGACY_JSON.is_file() else []
+
+
+def _is_legacy(fid) -> bool:
+    return fid[0] == str(LEGACY_JSON)
+
+
+def _has_log(base: Path = STORE_PATH) -> bool:
+    """True once the log base file or its journal holds any rows."""
+    return bool(
+        any(p.exists() and p.stat().st_size for p in _base_files(base))
+        or _segments(base))
+
+
+def _source() -> Path | None:
+    """The file load() would read right now (same precedence as load)."""
+    if CLEANED_CSV.exists():
+        return CLEANED_CSV
+    for base in (STORE_PATH, DATA_PATH):    # DATA_PATH: not yet migrated
+        if _has_log(base):
+            return base
+    if SAMSUNG_CSV.exists():
+        return SAMSUNG_CSV
+    if _legacy():
+        return STORE_PATH           # empty log, archive only
+    return None
+
+
+def _version(src: Path | None):
     """
-    Load the primary data source:
-    1) If cleaned_sleep_data_2025.csv exists, load & return that.
-    2) Else if sleep_log.csv exists (and non-empty), load & return it.
-    3) Else if Samsung CSV exists, load that (converting from UTC to local).
-    4) Otherwise return an empty DataFrame.
+    Cache key: file ids of the source (base files + journal segments,
+    after the legacy archive).
     """
-    DATA_DIR.mkdir(exist_ok=True)
-    parse_cols = ["start_time", "end_time", "create_time", "update_time"]
+    if src is None:
+        return None
+    files = (_legacy() + _base_files(src) + _segments(src)
+             if src in LOG_BASES else [src])
+    return tuple(fid for fid in map(_file_id, files) if fid and fid[2])
+
+
+def _read_log_file(path: Path, columns=None) -> pd.DataFrame:
+    """Read a log base file or one journal segment (same layout)."""
+    if path == LEGACY_JSON:
+        return _to_schema(load_sleep_data(path))
+    fmt = format_for(path)
+    df = fmt.read(path, columns, DT_COLS)
+    if fmt.typed:                   # stored already normalised & local
+        return df
+    return _localise(_normalise_duration(df), DT_COLS)
+
+
+def _part(fid) -> pd.DataFrame:
+    """One parsed base/segment file, kept in _PARTS until it changes."""
+    part = _PARTS.get(fid)
+    if part is None:
+        part = _compact(_read_log_file(Path(fid[0])))
+        for old in [f for f in _PARTS if f[0] == fid[0]]:
+            del _PARTS[old]         # same file, older version
+        _PARTS[fid] = part
+    return part
+
+
+def _read_log(key, columns=None, start=None, end=None,
+              legacy: bool = True) -> pd.DataFrame:
+    """
+    Merge base files + journal segments named by `key`. Parsed pieces are
+    kept in _PARTS, so after an append only the newest segment is parsed.
+    `start`/`end` skip the year partitions outside [start, end) and keep
+    matching rows; with `columns`, read just those columns, bypassing
+    _PARTS. The legacy archive in `key` is added last (_with_legacy),
+    unless `legacy` is False.
+    """
+    for old in [f for f in _PARTS if f not in key]:
+        del _PARTS[old]             # deleted or rewritten since
+    archive = [fid for fid in key if legacy and _is_legacy(fid)]
+    key = [fid for fid in key if not _is_legacy(fid)]
+    ranged = start is not None or end is not None
+    key = [fid for fid in key if _in_range(fid, start, end)] if ranged else key
+    if columns is not None:
+        cols = _log_columns(columns, archive)
+        frames = [_compact(_read_log_file(Path(fid[0]), cols)) for fid in key]
+    else:
+        frames = [_part(fid) for fid in key]
+
+    if not frames:
+        df = pd.DataFrame(columns=COLUMNS if columns is None else cols)
+    elif len(frames) == 1:
+        df = frames[0]
+    else:
+        df = (pd.concat(frames, ignore_index=True)
+                .sort_values("start_time", kind="stable")
+                .reset_index(drop=True))
+    if ranged:
+        df = _between(df, start, end).reset_index(drop=True)
+    if archive:
+        df = _with_legacy(df, archive[0], start, end)
+    return df if columns is None else df[list(columns)]
+
+
+def _log_columns(columns, legacy) -> list:
+    """Columns to read for `columns`: plus the key _with_legacy matches on."""
+    return list(dict.fromkeys(
+        ["start_time", *(["end_time"] if legacy else []), *columns]))
+
+
+def _with_legacy(df: pd.DataFrame, fid, start=None, end=None) -> pd.DataFrame:
+    """
+    Log rows `df` plus the legacy archive's rows in [start, end) whose
+    (start_time, end_time) the log doesn't hold, sorted by start_time.
+    """
+    old = _between(_part(fid), start, end)
+    if not len(old):
+        return df
+    if len(df):
+        log = df[KEY_COLS][df["start_time"].between(old["start_time"].min(),
+                                                    old["start_time"].max())]
+        seen = pd.MultiIndex.from_frame(old[KEY_COLS]).isin(
+            pd.MultiIndex.from_frame(log))
+        old = old[~seen]
+    old = old[list(df.columns)].astype(df.dtypes.to_dict())
+    return (pd.concat([df, old], ignore_index=True)
+              .sort_values("start_time", kind="stable")
+              .reset_index(drop=True))
+
+
+def _read(src: Path | None) -> pd.DataFrame:
+    """
+    Parse one data source:
+    1) cleaned_sleep_data_2025.csv (your cleaned, complete data)
+    2) sleep_log.csv (user-generated log)
+    3) Samsung CSV (converting from UTC to local)
+    4) None → empty DataFrame.
+    """
+    parse_cols = DT_COLS
 
     # 1) Your cleaned, complete data takes precedence
-    if CLEANED_CSV.exists():
+    if src == CLEANED_CSV:
         df = pd.read_csv(
             CLEANED_CSV,
             parse_dates=parse_cols,
@@ -77,12 +330,11 @@ def load() -> pd.DataFrame:
         return _localise(_normalise_duration(df), parse_cols)
 
     # 2) User-generated log
-    if DATA_PATH.exists() and DATA_PATH.stat().st_size:
-        df = pd.read_csv(DATA_PATH, parse_dates=parse_cols)
-        return _localise(_normalise_duration(df), parse_cols)
+    if src in LOG_BASES:
+        return _read_log_file(src)
 
     # 3) Samsung fallback (assume UTC timestamps)
-    if SAMSUNG_CSV.exists():
+    if src == SAMSUNG_CSV:
         df = pd.read_csv(SAMSUNG_CSV, parse_dates=parse_cols[:-1])
         df = _utc_to_local(df, ["start_time", "end_time"])
         return _localise(_normalise_duration(df), ["create_time"])
@@ -91,28 +343,602 @@ def load() -> pd.DataFrame:
     return pd.DataFrame(columns=COLUMNS)
 
 
+def _to_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Reorder to COLUMNS (adding blanks) and force the stored dtypes."""
+    df = df.reindex(columns=COLUMNS)
+    # Force datetime dtype so sorting never mixes strings & Timestamps
+    for col in DT_COLS:
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+    return _compact(df)
+
+
+def _write_lock():
+    """Inter-process lock around every change to the log's files."""
+    return file_lock(LOCK_PATH)
+
+
+def _write_base(df: pd.DataFrame) -> None:
+    """Write the whole log base via temp files + rename (no torn reads)."""
+    df = df.sort_values("start_time", kind="stable")
+    if not FORMAT.journaled:
+        atomic_write(STORE_PATH, lambda tmp: FORMAT.write(df, tmp))
+        return
+    parts = dict(tuple(df.groupby(_partition_labels(df["start_time"]))))
+    _write_partitions(parts)
+    for path in _base_files()[:-1]:             # years no longer present
+        if path.stem not in parts:
+            path.unlink(missing_ok=True)
+    STORE_PATH.unlink(missing_ok=True)          # now split into partitions
+
+
+def _write_partitions(parts: dict) -> None:
+    """Replace the year partitions named in `parts` ({label: rows})."""
+    PARTS_DIR.mkdir(exist_ok=True)
+    for label, rows in parts.items():
+        rows = rows.sort_values("start_time", kind="stable")
+        atomic_write(_partition_path(label),
+                     lambda tmp, rows=rows: FORMAT.write(rows, tmp))
+
+
+def _maybe_compact() -> None:
+    """Kick off a background compact() once the journal is big enough."""
+    segs = _segments()
+    size = sum(p.stat().st_size for p in segs if p.exists())
+    if (len(segs) >= COMPACT_SEGMENTS or size >= COMPACT_BYTES) \
+            and not _COMPACT_LOCK.locked():
+        threading.Thread(target=compact, daemon=True,
+                         name="sleep-log-compact").start()
+
+
+def _refresh_rollups(before, rows: pd.DataFrame = None) -> None:
+    """Keep utils.rollups in step with a write (rows=None: all changed)."""
+    from .rollups import refresh
+    refresh(before, rows)
+
+
+def _refresh_index(before, added=None, changed=None) -> None:
+    """Keep utils.row_index in step with a write (None: all changed)."""
+    from .row_index import refresh
+    refresh(before, added, changed)
+
+
+def _snapshot(reason: str) -> None:
+    """Let utils.snapshots keep the log as it is, before it changes."""
+    from .snapshots import take
+    take(reason)
+
+
+def _concat(frames: list) -> pd.DataFrame:
+    """concat that skips empty frames (and gives an empty schema frame)."""
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+# ── Public API ────────────────────────────────────────────────────────────
+
+
+@timed
+def data_version():
+    """Identity of the current data source; changes on every write."""
+    return _version(_source())
+
+
+def log_files() -> list[Path]:
+    """Files the sleep log is stored in right now (partitions + journal)."""
+    return [Path(fid[0]) for fid in _version(STORE_PATH) or ()
+            if not _is_legacy(fid)]
+
+
+@timed
+def invalidate_cache() -> None:
+    """Drop the shared frame (call after writing the log files directly)."""
+    with _CACHE_LOCK:
+        _CACHE.clear()
+        _PARTS.clear()
+
+
+def _between(df: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+    """Rows whose start_time lies in [start, end)."""
+    if start is None and end is None:
+        return df
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df["start_time"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df["start_time"] < pd.Timestamp(end)
+    return df[mask]
+
+
+@timed
+def load(columns=None, start=None, end=None, sensors=False,
+         legacy=True) -> pd.DataFrame:
+    """
+    Load the primary data source (see _read for precedence), cached
+    process-wide on (path, mtime, size) so all sessions share one parse.
+    The log is transparently merged with its journal segments.
+    `columns` projects the result (typed formats read only those columns);
+    `start`/`end` keep rows with start_time in [start, end).
+    `sensors=True` adds heart-rate/stress features (utils.sensors).
+    `legacy=False` leaves out the read-only archive (LEGACY_JSON) – the
+    rows a write may copy back into the log.
+
+    The returned frame shares memory with the cache – treat it as
+    read-only and .copy() before editing cells in place.
+    """
+    DATA_DIR.mkdir(exist_ok=True)
+    if sensors:
+        from .sensors import annotated      # numpy stores only when asked
+        df = annotated(start, end)
+        return df if columns is None else df[list(columns)]
+
+    # readers take no lock: a writer in another process may delete or
+    # rewrite files between listing and reading them – then list again
+    for attempt in range(READ_RETRIES):
+        try:
+            return _load_source(columns, start, end, legacy)
+        except (FileNotFoundError, _Rewritten):
+            if attempt == READ_RETRIES - 1:
+                raise
+
+
+class _Rewritten(Exception):
+    """The log's files changed while load() was reading them."""
+
+
+def _load_source(columns, start, end, legacy=True) -> pd.DataFrame:
+    src = _source()
+    key = _version(src)
+    if not key:
+        df = _read(None)
+        return df if columns is None else df[list(columns)]
+    if not legacy and any(map(_is_legacy, key)):
+        # the log's own rows (pieces from _PARTS), not cached as a whole
+        with _CACHE_LOCK:
+            df = _read_log(key, columns, start, end, legacy=False)
+        if _version(src) != key:
+            raise _Rewritten
+        return df
+
+    ranged = start is not None or end is not None
+    with _CACHE_LOCK:
+        df = _CACHE.get(key)
+        if df is None and src == STORE_PATH and FORMAT.name == "sqlite" \
+                and STORE_PATH.exists() and (ranged or columns is not None):
+            # indexed range query straight from the database
+            archive = [fid for fid in key if _is_legacy(fid)]
+            cols = None if columns is None else _log_columns(columns, archive)
+            df = _compact(FORMAT.read(STORE_PATH, cols, DT_COLS,
+                                      start=start, end=end))
+            if archive:
+                df = _with_legacy(df, archive[0], start, end)
+            return df if columns is None else df[list(columns)]
+        if df is None and (ranged or columns is not None) \
+                and src in LOG_BASES:
+            # only the year partitions and columns asked for
+            df = _read_log(key, columns, start, end)
+            if _version(src) != key:
+                raise _Rewritten
+            return df
+        if df is None:
+            df = _read_log(key) if src in LOG_BASES else _compact(_read(src))
+            if _version(src) != key:
+                raise _Rewritten
+            _CACHE.clear()          # only the newest version is ever useful
+            _CACHE[key] = df
+    df = _between(df.copy(deep=False), start, end)
+    return df if columns is None else df[list(columns)]
+
+
+@timed
 def append(df_new: pd.DataFrame) -> None:
     """
-    Append new rows to sleep_log.csv (creating it if needed).
+    Append new rows to the sleep log's journal (creating it if needed).
+    Cost depends only on len(df_new); compact() later folds the journal
+    into the base file.
+    """
+    _submit("append", _to_schema(df_new))
+
+
+def _write_segment(df_new: pd.DataFrame) -> None:
+    """Add schema-shaped rows to the journal (or the SQLite table)."""
+    with _write_lock():
+        if not FORMAT.journaled:
+            FORMAT.append(df_new, STORE_PATH)
+            return
+
+        JOURNAL_DIR.mkdir(exist_ok=True)
+        seg = _active_segment()
+        if FORMAT.appendable and seg.exists():
+            def write(tmp):             # copy (≤ SEGMENT_BYTES) + append
+                shutil.copyfile(seg, tmp)
+                FORMAT.append(df_new, tmp)
+        else:
+            def write(tmp):
+                FORMAT.write(df_new, tmp)
+        atomic_write(seg, write)
+
+
+@timed
+def upsert(df_new: pd.DataFrame) -> tuple[int, int]:
+    """
+    Insert rows whose (start_time, end_time) is new. For existing ones,
+    overwrite the non-blank values that differ and bump update_time
+    (only when something changed). Returns (inserted, updated).
+    """
+    now = pd.Timestamp.now(TZ).tz_localize(None)
+    df_new = _to_schema(df_new)
+    df_new["create_time"] = df_new["create_time"].fillna(now)
+    df_new["update_time"] = now
+    return _submit("upsert", df_new)
+
+
+@timed
+def merge_rows(df_new: pd.DataFrame,
+               snapshot: bool = True) -> tuple[int, int, int]:
+    """
+    upsert() for imports: rows identical to the stored ones are found
+    through the hash index (utils.row_index) and skipped, so
+    only new and changed rows are written – re-importing a backup is
+    close to free. Rows repeating a (start_time, end_time) collapse to
+    the last one, as they would in upsert(); rows with neither a full
+    key nor any value (a template's empty days) are dropped. Returns
+    (inserted, updated, unchanged). snapshot=False skips the snapshot
+    taken before the write (later chunks of one streamed import).
+    """
+    now = pd.Timestamp.now(TZ).tz_localize(None)
+    n_rows = len(df_new)
+    df_new = _to_schema(df_new)
+    keyed = df_new[KEY_COLS].notna().all(axis=1)
+    blank = ~keyed & df_new[VALUE_COLS].isna().all(axis=1)
+    df_new = df_new[~blank
+                    & ~(keyed & df_new.duplicated(KEY_COLS, keep="last"))]
+    df_new["create_time"] = df_new["create_time"].fillna(now)
+    df_new["update_time"] = now
+    inserted, updated = _submit("merge", df_new, snapshot)
+    return inserted, updated, n_rows - inserted - updated
+
+
+def _merge(cur: pd.DataFrame, df_new: pd.DataFrame):
+    """
+    Vectorised upsert of df_new into `cur` (edited in place): match on
+    the key columns, copy differing non-blank values, bump update_time.
+    Returns (rows of df_new that matched nothing, index of changed rows).
     """
+    known = cur[cur[KEY_COLS].notna().all(axis=1)]
+    first = (known.reset_index()
+                  .drop_duplicates(KEY_COLS)[KEY_COLS + ["index"]])
+    hit = df_new.merge(first, on=KEY_COLS, how="left")["index"]
+    hit = hit.where(df_new[KEY_COLS].notna().all(axis=1).to_numpy())
+    found = hit.notna().to_numpy()
+
+    upd = df_new[found].reset_index(drop=True)
+    idx = hit[found].astype(int).to_numpy()
+    changed = np.zeros(len(upd), dtype=bool)
+    for c in VALUE_COLS:
+        new, old = upd[c], cur.loc[idx, c].reset_index(drop=True)
+        diff = (new.notna() & (old.isna() | (new != old))).fillna(False)
+        diff = diff.to_numpy(dtype=bool)
+        cur.loc[idx[diff], c] = new[diff].to_numpy()
+        changed |= diff
+    cur.loc[idx[changed], "update_time"] = upd["update_time"][changed].to_numpy()
+    return df_new[~found], np.unique(idx[changed])
+
+
+# ── Group commit ──────────────────────────────────────────────────────────
+# append() and upsert() from every session queue their rows. One caller
+# at a time becomes the leader: it waits GROUP_COMMIT_S for others to
+# join, then applies the whole queue under the write lock with one read
+# of the log, one file write and one rollup refresh. The rest just wait.
+
+def _submit(kind: str, rows: pd.DataFrame, snapshot: bool = True):
+    """Queue one write and return its result once a flush applied it."""
+    req = {"kind": kind, "rows": rows, "snapshot": snapshot, "done": False,
+           "result": None, "error": None}
+    with _PENDING_LOCK:
+        _PENDING.append(req)
+    with _FLUSH_LOCK:
+        if not req["done"]:             # nobody flushed it meanwhile
+            time.sleep(GROUP_COMMIT_S)
+            with _PENDING_LOCK:
+                batch = _PENDING[:]
+                _PENDING.clear()
+            try:
+                _flush(batch)
+            except Exception as exc:
+                for r in batch:
+                    r["error"] = exc
+            for r in batch:
+                r["done"] = True
+    if req["error"] is not None:
+        raise req["error"]
+    return req["result"]
+
+
+@timed(name="data_io.flush")
+def _flush(batch: list[dict]) -> None:
+    """Apply queued appends/upserts/merges in arrival order as one write."""
     DATA_DIR.mkdir(exist_ok=True)
+    with _write_lock():
+        if not _has_log():              # seed the store before merging
+            _replace(load(legacy=False))
+        kinds = {r["kind"] for r in batch if r["snapshot"]}
+        if kinds & {"upsert", "merge"}:  # may change existing rows
+            _snapshot("import" if "merge" in kinds else "save")
+        before = data_version()
+        if FORMAT.name == "sqlite":
+            added, changed = _flush_sqlite(batch), None
+            written = added
+        else:
+            added, changed = _shadowing(*_flush_files(batch))
+            written = _concat([added, changed])
+        if len(written):
+            _refresh_rollups(before, written[KEY_COLS])
+            _refresh_index(before, added, changed)
+    _maybe_compact()
+
+
+def _shadowing(added: pd.DataFrame, changed: pd.DataFrame) -> tuple:
+    """
+    (added, changed) as load() sees them: a new log row with the key of
+    a legacy archive row replaces that row, so it counts as a change.
+    """
+    fid = next((f for f in _version(STORE_PATH) or () if _is_legacy(f)), None)
+    if fid is None or not len(added):
+        return added, changed
+    with _CACHE_LOCK:
+        keys = pd.MultiIndex.from_frame(_part(fid)[KEY_COLS])
+    hit = pd.MultiIndex.from_frame(added[KEY_COLS]).isin(keys)
+    if not hit.any():
+        return added, changed
+    return added[~hit], _concat([changed, added[hit]])
+
+
+def _skip_same(r: dict, first: bool) -> str:
+    """
+    Drop the rows of a merge request that the hash index finds
+    unchanged. Returns how to apply the rest: "append" when all are new,
+    else "upsert". Only the first request of a batch can be checked –
+    the index doesn't know the rows queued before it.
+    """
+    from .row_index import CHANGED, SAME, classify
+    if not first:
+        return "upsert"
+    codes = classify(r["rows"])
+    r["rows"] = r["rows"][codes != SAME]
+    r["result"] = (len(r["rows"]), 0)
+    return "upsert" if (codes == CHANGED).any() else "append"
+
+
+def _flush_sqlite(batch: list[dict]) -> pd.DataFrame:
+    """SQLite: one indexed-upsert transaction per request; rows sent."""
+    sent = []
+    for i, r in enumerate(batch):
+        if r["kind"] == "merge":
+            _skip_same(r, i == 0)
+        if not len(r["rows"]):
+            continue
+        counts = FORMAT.upsert(r["rows"], STORE_PATH)
+        r["result"] = None if r["kind"] == "append" else counts
+        sent.append(r["rows"])
+    return _concat(sent)
+
+
+def _flush_files(batch: list[dict]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    File formats: new rows go to one journal segment; if an upsert
+    changed existing rows, the partitions of their years (and of the
+    new and journaled rows) are rewritten once instead.
+    Returns (rows added, changed rows as stored now).
+    """
+    cur, added, dirty, changed = None, [], set(), set()
+    for i, r in enumerate(batch):
+        kind = r["kind"]
+        if kind == "merge":
+            kind = _skip_same(r, i == 0)
+        rows = r["rows"]
+        if kind == "upsert":
+            if cur is None:             # sees rows queued before it
+                cur = pd.concat([load(legacy=False), *added],
+                                ignore_index=True)
+            rows, idx = _merge(cur, rows)
+            r["result"] = (len(rows), len(idx))
+            dirty.update(_partition_labels(cur.loc[idx, "start_time"]))
+            changed.update(idx)
+        if len(rows):
+            added.append(rows)
+            if cur is not None:
+                cur = pd.concat([cur, rows], ignore_index=True)
+
+    if dirty:
+        for rows in added:
+            dirty.update(_partition_labels(rows["start_time"]))
+        _replace(cur, dirty)
+    elif added:
+        _write_segment(_concat(added))
+    changed = cur.loc[sorted(changed)] if changed else _concat([])
+    return _concat(added), changed
+
+
+def _replace(df: pd.DataFrame, dirty: set = None) -> None:
+    """
+    Make `df` the whole log and empty the journal. With `dirty` partition
+    labels, only those partitions (and the journal's) are rewritten – the
+    caller vouches that the rest of `df` matches the files.
+    """
+    DATA_DIR.mkdir(exist_ok=True)
+    df = _to_schema(df)
+    with _write_lock():
+        segs = _segments()
+        if dirty is None or not FORMAT.journaled or STORE_PATH.exists():
+            _write_base(df)
+        else:
+            for fid in _version(STORE_PATH):
+                if Path(fid[0]).parent == JOURNAL_DIR:
+                    dirty |= set(_partition_labels(_part(fid)["start_time"]))
+            labels = _partition_labels(df["start_time"])
+            _write_partitions({label: rows for label, rows in df.groupby(labels)
+                               if label in dirty})
+        for seg in segs:
+            seg.unlink(missing_ok=True)
+    invalidate_cache()
+
+
+@timed
+def overwrite(df: pd.DataFrame) -> None:
+    """Replace the whole sleep log with `df` and discard the journal."""
+    with _write_lock():
+        _snapshot("overwrite")
+        _replace(df)
+    _refresh_rollups(None)
+
+
+@timed
+def clear() -> None:
+    """Delete the log, its journal and any not-yet-migrated CSV log."""
+    with _write_lock():
+        _snapshot("clear")
+        for base in LOG_BASES:
+            for path in _base_files(base) + _segments(base):
+                path.unlink(missing_ok=True)
+    invalidate_cache()
+    _refresh_rollups(None)
+
+
+@timed
+def migrate(force: bool = False) -> int:
+    """
+    One-time copy of the CSV data load() shows today into STORE_PATH.
+    Returns the number of rows written (0 if already migrated).
+    """
+    if STORE_PATH == DATA_PATH or (_has_log() and not force):
+        return 0
+    src = next((p for p in (CLEANED_CSV, DATA_PATH, SAMSUNG_CSV)
+                if (_has_log(p) if p == DATA_PATH else p.exists())), None)
+    key = _version(src)
+    if not key:
+        return 0
+    with _CACHE_LOCK:
+        df = (_read_log(key, legacy=False) if src == DATA_PATH
+              else _compact(_read(src)))
+    overwrite(df)
+    return len(df)
+
+
+def _fold_journal(bases: tuple, journal: tuple) -> dict:
+    """
+    {partition label: rows} for every year the journal segments touch:
+    the partition's current rows followed by the journal's rows.
+    """
+    if not journal:
+        return {}
+    new = pd.concat([_part(fid) for fid in journal], ignore_index=True)
+    paths = {fid[0]: fid for fid in bases if fid}
+    parts = {}
+    for label, rows in new.groupby(_partition_labels(new["start_time"])):
+        old = paths.get(str(_partition_path(label)))
+        parts[label] = (pd.concat([_part(old), rows], ignore_index=True)
+                        if old else rows)
+    return parts
+
+
+@timed
+def compact() -> None:
+    """
+    Merge the current journal segments into the year partitions they
+    touch (other years are left alone). Appends arriving meanwhile go to
+    a fresh segment and are kept; the write lock is only held to seal
+    the journal and to swap the files.
+    """
+    if not _COMPACT_LOCK.acquire(blocking=False):
+        return                      # another compaction is already running
+    try:
+        with _write_lock():
+            segs = _segments()
+            bases = tuple(map(_file_id, _base_files()))
+            if segs and FORMAT.appendable:
+                _next_segment(segs).touch()     # seal: appends go past it
+        if not segs:
+            return
+        journal = tuple(fid for fid in map(_file_id, segs) if fid and fid[2])
+        unsplit = bases[-1] is not None         # STORE_PATH from before
+        try:
+            with _CACHE_LOCK:
+                if unsplit:
+                    df = _read_log(tuple(fid for fid in bases + journal
+                                         if fid and fid[2]))
+                else:
+                    parts = _fold_journal(bases, journal)
+        except FileNotFoundError:
+            return                  # replaced or compacted meanwhile
+        with _write_lock():
+            if tuple(map(_file_id, _base_files())) != bases \
+                    or not all(seg.exists() for seg in segs):
+                return              # replaced or compacted meanwhile
+            before = data_version()
+            if unsplit:
+                _write_base(df)
+            else:
+                _write_partitions(parts)
+            for seg in segs:
+                seg.unlink(missing_ok=True)
+            _refresh_rollups(before, pd.DataFrame(columns=KEY_COLS))
+            _refresh_index(before, _concat([]), _concat([]))   # same rows
+    finally:
+        _COMPACT_LOCK.release()
+
+
+def _parse_times(col: pd.Series, day: pd.Series) -> pd.Series:
+    """
+    Vectorised "full datetime, else HH:MM + date_only" parser.
+    `day` holds date_only as a "%Y-%m-%d " string (NaN when unknown).
+    """
+    raw = col.astype("string").str.strip()
+    hhmm = raw.str.fullmatch(r"\d{1,2}:\d{2}").fillna(False)
 
-    # Ensure all columns exist in the correct order
-    for col in COLUMNS:
-        if col not in df_new.columns:
-            df_new[col] = pd.NA
-    df_new = df_new[COLUMNS]
+    # a) full datetimes: ISO fast path, then anything dateutil accepts
+    full = pd.to_datetime(raw.where(~hhmm), format="ISO8601", errors="coerce")
+    odd = full.isna() & raw.notna() & ~hhmm
+    if odd.any():
+        full[odd] = pd.to_datetime(raw[odd], format="mixed", errors="coerce")
 
-    df_all = pd.concat([load(), df_new], ignore_index=True)
+    # b) HH:MM next to a date_only
+    clock = pd.to_datetime(day + raw.where(hhmm),
+                           format="%Y-%m-%d %H:%M", errors="coerce")
+    return full.fillna(clock)
 
-    # Force datetime dtype so sorting never mixes strings & Timestamps
-    for col in ("start_time", "end_time", "create_time", "update_time"):
-        df_all[col] = pd.to_datetime(df_all[col], errors="coerce")
 
-    df_all.sort_values("start_time").to_csv(DATA_PATH, index=False)
+def _parse_import(tmp: pd.DataFrame, now: pd.Timestamp) -> pd.DataFrame:
+    """Turn one chunk of a cleaned upload into COLUMNS-shaped rows."""
+    # Normalize column names
+    tmp.columns = tmp.columns.str.strip().str.lower().str.replace(" ", "_", regex=False)
+    for c in ["date_only", *COLUMNS]:
+        if c not in tmp.columns:
+            tmp[c] = pd.NA
+
+    # Parse date_only, then start/end: full datetime or HH:MM + date_only
+    day = pd.to_datetime(tmp["date_only"], errors="coerce").dt.strftime("%Y-%m-%d ")
+    start = _parse_times(tmp["start_time"], day)
+    end = _parse_times(tmp["end_time"], day)
+
+    # Cross-midnight: end before start → +1 day
+    end = end.mask(end < start, end + timedelta(days=1))
+
+    # Keep given durations; fill only missing ones (hours, 2 decimals)
+    dur = pd.to_numeric(tmp["sleep_duration"], errors="coerce")
+    calc = ((end - start).dt.total_seconds() / 3600.0).round(2)
+
+    out = tmp[COLUMNS].copy()
+    out["start_time"] = start
+    out["end_time"] = end
+    out["sleep_duration"] = dur.fillna(calc)
+    out["create_time"] = now
+    out["update_time"] = now
+    return out
 
 
-def import_external(uploaded_file) -> pd.DataFrame:
+@timed
+def import_external(uploaded_file) -> tuple[pd.DataFrame, tuple]:
     """
     Read a cleaned CSV with:
       date_only, start_time, end_time,
@@ -123,75 +949,25 @@ def import_external(uploaded_file) -> pd.DataFrame:
     • Parses full datetimes or HH:MM + date_only
     • Handles cross-midnight sleeps
     • Leaves existing sleep_duration, fills only missing
-    • Stamps create/update time and writes data/sleep_log.csv
+    • Merges into the sleep log (merge_rows): only new and changed rows
+      are written, rows entered through the form are kept
+    Returns the parsed rows and merge_rows' (inserted, updated, unchanged).
     """
-    # 1️⃣ Load raw CSV into DataFrame
-    tmp = pd.read_csv(uploaded_file)
+    now = pd.Timestamp.now(TZ).tz_localize(None)
+    out = _parse_import(pd.read_csv(uploaded_file), now)
+    return out, merge_rows(out)
 
-    # 2️⃣ Normalize column names
-    tmp.columns = tmp.columns.str.strip().str.lower().str.replace(" ", "_", regex=False)
 
-    # 3️⃣ Parse date_only to a date
-    tmp["date_only"] = pd.to_datetime(
-        tmp["date_only"], errors="coerce").dt.date
-
-    # 4️⃣ Smart parser: try full datetime, else HH:MM + date_only
-    def parse_dt(val, date_only):
-        if pd.notna(val):
-            # 4.a) Try ISO datetime first
-            dt = pd.to_datetime(val, errors="coerce")
-            if pd.notna(dt):
-                return dt.to_pydatetime()
-            # 4.b) Fallback to HH:MM next to a date_only
-            s = str(val).strip()
-            if date_only and s:
-                try:
-                    t = datetime.strptime(s, "%H:%M").time()
-                    return datetime.combine(date_only, t)
-                except ValueError:
-                    return pd.NaT
-        return pd.NaT
-
-    tmp["start_time"] = tmp.apply(lambda r: parse_dt(
-        r.get("start_time"), r["date_only"]), axis=1)
-    tmp["end_time"] = tmp.apply(lambda r: parse_dt(
-        r.get("end_time"),   r["date_only"]), axis=1)
-
-    # 5️⃣ Handle cross-midnight (if end < start → +1 day)
-    tmp["end_time"] = tmp.apply(
-        lambda r: (r["end_time"] + timedelta(days=1))
-        if pd.notna(r["start_time"]) and pd.notna(r["end_time"]) and r["end_time"] < r["start_time"]
-        else r["end_time"],
-        axis=1
-    )
-
-    # 6️⃣ Calculate any missing durations (hours, 2 decimals)
-    def calc_dur(r):
-        if pd.notna(r.get("sleep_duration")):
-            return r["sleep_duration"]
-        s, e = r["start_time"], r["end_time"]
-        if pd.isna(s) or pd.isna(e):
-            return pd.NA
-        return round((e - s).total_seconds() / 3600.0, 2)
-
-    tmp["sleep_duration"] = tmp.apply(calc_dur, axis=1)
-
-    # 7️⃣ Stamp create_time & update_time
+@timed
+def import_external_stream(uploaded_file,
+                           chunksize: int = IMPORT_CHUNK_ROWS) -> tuple:
+    """
+    Same as import_external, for uploads too big to hold in memory:
+    parses and merges `chunksize` rows at a time, with one snapshot
+    before the first. Returns the summed (inserted, updated, unchanged).
+    """
     now = pd.Timestamp.now(TZ).tz_localize(None)
-    tmp["create_time"] = now
-    tmp["update_time"] = now
-
-    # 8️⃣ Reorder & write out
-    out = tmp[[
-        "start_time", "end_time",
-        "physical_recovery", "mental_recovery",
-        "sleep_cycle", "sleep_score",
-        "sleep_duration", "create_time", "update_time"
-    ]].copy()
-
-    # Ensure data dir & write
-    DATA_DIR.mkdir(exist_ok=True)
-    out.sort_values("start_time")\
-       .to_csv(DATA_DIR / "sleep_log.csv", index=False)
-
-    return out
+    total = np.zeros(3, dtype=int)
+    for i, chunk in enumerate(pd.read_csv(uploaded_file, chunksize=chunksize)):
+        total += merge_rows(_parse_import(chunk, now), snapshot=i == 0)
+    return tuple(total.tolist())
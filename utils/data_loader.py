@@ -1,30 +1,154 @@
+# utils/data_loader.py
 import json
+from array import array
+from pathlib import Path
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-
-
-def load_sleep_data(filepath):
-    with open(filepath, "r") as f:
-        raw_data = json.load(f)
-
-    records = []
-    for entry in raw_data["sleep_record"]:
-        date = entry["date"]
-        sleep = entry["sleep"]
-        wake = entry["wake"]
-
-        sleep_time = datetime(int(date["year"]), int(date["month"]), int(date["day"]),
-                              int(sleep["hour"]), int(sleep["min"]))
-        wake_time = datetime(int(date["year"]), int(date["month"]), int(date["day"]),
-                             int(wake["hour"]), int(wake["min"]))
-        if wake_time <= sleep_time:
-            wake_time += timedelta(days=1)
-
-        records.append({
-            "sleep_time": sleep_time,
-            "wake_time": wake_time,
-            "duration": entry.get("duration", round((wake_time - sleep_time).seconds / 3600, 2)),
-            "mood": None  # You can update this later
-        })
-
-    return pd.DataFrame(records)
+
+# ── Legacy sleep_data.json archive (2022–2024, kept by hand) ──────────────
+#   {"sleep_record": [{"date":  {"year": 2022, "month": "02", "day": "01"},
+#                      "sleep": {"hour": "22", "min": "45"},
+#                      "wake":  {"hour": "23", "min": "59"},
+#                      "duration": 5.2}, …]}
+# Records are decoded one at a time from a small read buffer and their
+# fields appended to typed column arrays, so the document is never held
+# in memory – only the columns being built. "duration" is the total for
+# the day, not the record, so each sleep's own span is used instead.
+# The archive splits overnight sleeps at midnight (wake 23:59, then a
+# record falling asleep at 00:00); iter_sessions() joins each such pair
+# back into one sleep.
+
+READ_BYTES = 64 * 1024             # text read per refill of the buffer
+CHUNK_ROWS = 50_000                # records per frame from iter_frames()
+ARRAY_KEY = '"sleep_record"'
+FIELDS = [("date", "year"), ("date", "month"), ("date", "day"),
+          ("sleep", "hour"), ("sleep", "min"),
+          ("wake", "hour"), ("wake", "min")]
+
+
+def iter_records(path, read_bytes: int = READ_BYTES):
+    """Yield the objects of the "sleep_record" array one by one."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as fh:
+        buf, pos, eof = "", 0, False
+
+        def more() -> bool:
+            nonlocal buf, pos, eof
+            chunk = fh.read(read_bytes)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+            return not eof
+
+        # skip to the opening bracket of the array
+        while True:
+            at = buf.find(ARRAY_KEY, pos)
+            bracket = buf.find("[", at + len(ARRAY_KEY)) if at >= 0 else -1
+            if bracket >= 0:
+                pos = bracket + 1
+                break
+            pos = at if at >= 0 else max(len(buf) - len(ARRAY_KEY), 0)
+            if not more():
+                return                  # no sleep_record array at all
+
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buf):
+                if not more():
+                    raise ValueError(f"{path}: sleep_record array not closed")
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not more():          # a truncated record, or bad JSON
+                    raise
+                continue
+            yield record
+            pos = end
+
+
+def _clock(record: dict, part: str) -> tuple | None:
+    """(hour, min) of record[part] ("sleep"/"wake"), None if unreadable."""
+    try:
+        return int(record[part]["hour"]), int(record[part]["min"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def iter_sessions(records):
+    """
+    `records` with the midnight splits joined: a record waking at 23:59
+    followed by one falling asleep at 00:00 becomes the first record with
+    the second's wake time (the overnight rule in _to_frame puts it on
+    the next day).
+    """
+    prev = None
+    for record in records:
+        if prev is not None and _clock(prev, "wake") == (23, 59) \
+                and _clock(record, "sleep") == (0, 0):
+            yield {**prev, "wake": record["wake"]}
+            prev = None
+            continue
+        if prev is not None:
+            yield prev
+        prev = record
+    if prev is not None:
+        yield prev
+
+
+def _columns() -> tuple[dict, array]:
+    """Empty typed arrays: one per FIELDS entry (-1 = missing) + duration."""
+    return {f"{a}.{b}": array("h") for a, b in FIELDS}, array("d")
+
+
+def _to_frame(cols: dict, duration: array) -> pd.DataFrame:
+    """Column arrays → start_time, end_time, sleep_duration (hours)."""
+    c = {k: np.frombuffer(v, dtype="int16").astype("int64")
+         for k, v in cols.items()}
+    bad = np.any([v < 0 for v in c.values()], axis=0) if len(duration) \
+        else np.zeros(0, dtype=bool)
+    day = pd.to_datetime({"year": c["date.year"], "month": c["date.month"],
+                          "day": c["date.day"]}, errors="coerce").mask(bad)
+    start = day + pd.to_timedelta(c["sleep.hour"] * 60 + c["sleep.min"], unit="m")
+    end = day + pd.to_timedelta(c["wake.hour"] * 60 + c["wake.min"], unit="m")
+    end = end.mask(end <= start, end + pd.Timedelta(days=1))    # overnight
+    df = pd.DataFrame({
+        "start_time": start,
+        "end_time": end,
+        "sleep_duration": ((end - start).dt.total_seconds() / 3600).round(2),
+        "day_total": np.frombuffer(duration, dtype="float64"),
+    })
+    return df.dropna(subset=["start_time"]).reset_index(drop=True)
+
+
+def iter_frames(path, chunk_rows: int = CHUNK_ROWS):
+    """
+    Stream the archive as frames of up to `chunk_rows` sleeps (midnight
+    splits joined, see iter_sessions):
+    start_time / end_time (naïve local), sleep_duration (hours) and the
+    archive's day_total.
+    """
+    cols, duration = _columns()
+    targets = [(a, b, cols[f"{a}.{b}"]) for a, b in FIELDS]
+    for record in iter_sessions(iter_records(path)):
+        for a, b, arr in targets:
+            try:
+                arr.append(int(record[a][b]))
+            except (KeyError, TypeError, ValueError, OverflowError):
+                arr.append(-1)          # → NaT, dropped
+        total = record.get("duration")
+        duration.append(np.nan if total is None else float(total))
+        if len(duration) == chunk_rows:
+            yield _to_frame(cols, duration)
+            cols, duration = _columns()
+            targets = [(a, b, cols[f"{a}.{b}"]) for a, b in FIELDS]
+    if len(duration):
+        yield _to_frame(cols, duration)
+
+
+def load_sleep_data(filepath) -> pd.DataFrame:
+    """The whole archive as one frame (see iter_frames for the columns)."""
+    frames = list(iter_frames(Path(filepath))) or [_to_frame(*_columns())]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
@@ -0,0 +1,165 @@
+# utils/exports.py
+import threading
+import zlib
+import pandas as pd
+from .data_io import COLUMNS, data_version, load
+from .perf import timed
+from .rollups import first_per_day
+from .timeviews import hhmm
+
+# ── Downloads: Sheets template + raw log in several formats ───────────────
+# Nothing is built until someone asks for a file. Raw exports are written
+# EXPORT_CHUNK_ROWS rows at a time (one gzip stream / Parquet row group /
+# run of JSON lines per chunk), so only the output and one chunk of text
+# are in memory. The finished bytes are kept per data_version(), so asking
+# again – or from another session – is free until the log changes.
+
+EXPORT_CHUNK_ROWS = 50_000
+EXPORT_CACHE_ITEMS = 4             # finished files kept per data version
+
+# format → (label, file suffix, mime type)
+FORMATS = {
+    "template": ("Sheets template (CSV)", ".csv", "text/csv"),
+    "csv.gz":   ("Sleep log (gzip CSV)", ".csv.gz", "application/gzip"),
+    "parquet":  ("Sleep log (Parquet)", ".parquet",
+                 "application/vnd.apache.parquet"),
+    "jsonl":    ("Sleep log (JSON Lines)", ".jsonl", "application/jsonl"),
+}
+
+_CACHE: dict = {}                  # {(version, fmt, start, end): bytes}
+_LOCK = threading.Lock()
+
+
+def _day(when) -> pd.Timestamp | None:
+    return None if when is None else pd.Timestamp(when).normalize()
+
+
+def _chunks(start, end):
+    """The log's rows with start_time in [start, end), a chunk at a time."""
+    df = load(start=start, end=end)
+    for lo in range(0, len(df), EXPORT_CHUNK_ROWS):
+        yield df.iloc[lo:lo + EXPORT_CHUNK_ROWS][COLUMNS]
+
+
+def _template(start, end) -> bytes:
+    """
+    One row per day in [start, end): the first sleep of the day, times
+    as HH:MM, blanks for days without one – the layout of
+    cleaned_sleep_data_2025.csv.
+    """
+    calendar = pd.DataFrame(
+        {"date_only": pd.date_range(start, end, freq="D", inclusive="left")})
+    template = calendar.merge(first_per_day(start=start, end=end),
+                              on="date_only", how="left")
+    for c in ("start_time", "end_time"):
+        template[c] = hhmm(template[c])
+    return template.to_csv(index=False).encode()
+
+
+class _Sink:
+    """Write-only file that hands over what was written since last time."""
+    closed = False
+
+    def __init__(self):
+        self.parts, self.size = [], 0
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.size
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        out, self.parts = b"".join(self.parts), []
+        return out
+
+
+def iter_export(fmt: str, start=None, end=None):
+    """
+    Yield the bytes of export `fmt` (see FORMATS) piece by piece, for
+    sleeps starting in [start, end) (days; None = open-ended).
+    """
+    if fmt == "template":
+        today = pd.Timestamp.now().normalize()
+        yield _template(start or today.replace(month=1, day=1),
+                        end or today + pd.Timedelta(days=1))
+    elif fmt == "csv.gz":
+        gz = zlib.compressobj(wbits=31)         # one gzip member
+        header = True
+        for chunk in _chunks(start, end):
+            yield gz.compress(chunk.to_csv(index=False, header=header).encode())
+            header = False
+        if header:                              # no rows: header only
+            yield gz.compress(",".join(COLUMNS).encode() + b"\n")
+        yield gz.flush()
+    elif fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        sink, writer = _Sink(), None
+        for chunk in _chunks(start, end):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+            yield sink.take()
+        if writer is None:                      # no rows: empty file
+            empty = load(start=start, end=end).iloc[0:0][COLUMNS]
+            writer = pq.ParquetWriter(
+                sink, pa.Schema.from_pandas(empty, preserve_index=False))
+        writer.close()
+        yield sink.take()
+    elif fmt == "jsonl":
+        for chunk in _chunks(start, end):
+            text = chunk.to_json(orient="records", lines=True,
+                                 date_format="iso")
+            yield text.rstrip("\n").encode() + b"\n"
+    else:
+        raise ValueError(f"Unknown export format {fmt!r} "
+                         f"(choose from {', '.join(FORMATS)})")
+
+
+def file_name(fmt: str, start=None, end=None) -> str:
+    """e.g. sleep_log_2025-01-01_2025-12-31.csv.gz (end shown inclusive)."""
+    stem = "sleep_template" if fmt == "template" else "sleep_log"
+    days = [d.strftime("%Y-%m-%d") for d in
+            (_day(start), _day(end) and _day(end) - pd.Timedelta(days=1))
+            if d is not None]
+    return "_".join([stem, *days]) + FORMATS[fmt][1]
+
+
+def _key(fmt, start, end) -> tuple:
+    return (data_version(), fmt, _day(start), _day(end))
+
+
+def cached(fmt: str, start=None, end=None) -> bytes | None:
+    """The finished export if it was built for the current data, else None."""
+    with _LOCK:
+        return _CACHE.get(_key(fmt, start, end))
+
+
+@timed
+def export(fmt: str, start=None, end=None) -> bytes:
+    """
+    The whole export `fmt` for [start, end) as bytes, built on first
+    request and kept until the log changes.
+    """
+    key = _key(fmt, start, end)
+    with _LOCK:
+        data = _CACHE.get(key)
+    if data is None:
+        data = b"".join(iter_export(fmt, key[2], key[3]))
+        with _LOCK:
+            for old in [k for k in _CACHE if k[0] != key[0]]:
+                del _CACHE[old]                 # older data version
+            while len(_CACHE) >= EXPORT_CACHE_ITEMS:
+                del _CACHE[next(iter(_CACHE))]  # oldest first
+            _CACHE[key] = data
+    return data
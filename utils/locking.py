@@ -0,0 +1,81 @@
+# utils/locking.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:                                   # POSIX
+    import fcntl
+except ImportError:                    # Windows
+    fcntl = None
+    import msvcrt
+
+# ── Inter-process locking & atomic file replacement ───────────────────────
+# Every Streamlit server process (and the CLI scripts) writing the log
+# takes the same lock file. The lock is re-entrant within a thread, so a
+# write may call other locked writes; other threads and processes wait.
+
+RETRY_S = 0.01                     # poll interval where locks can't block
+_HELD = threading.local()          # {lock path: depth} for this thread
+
+
+def _acquire(fh) -> None:
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            time.sleep(RETRY_S)
+
+
+def _release(fh) -> None:
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+    else:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Exclusive lock on `path` across threads and processes."""
+    held = getattr(_HELD, "depth", None)
+    if held is None:
+        held = _HELD.depth = {}
+    key = str(path)
+    if held.get(key):
+        held[key] += 1             # this thread already owns it
+        try:
+            yield
+        finally:
+            held[key] -= 1
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as fh:
+        _acquire(fh)
+        held[key] = 1
+        try:
+            yield
+        finally:
+            held.pop(key, None)
+            _release(fh)
+
+
+def atomic_write(path: Path, write) -> None:
+    """
+    Call write(tmp) on a temporary file next to `path`, then rename it
+    over `path`: readers see the old file or the new one, never a torn one.
+    """
+    tmp = path.with_name(
+        f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
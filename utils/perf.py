@@ -0,0 +1,157 @@
+# utils/perf.py
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+# ── Opt-in instrumentation ────────────────────────────────────────────────
+# Off by default: then @timed is one flag check per call. Turn it on with
+# SLEEP_PERF=1 (SLEEP_PERF_MEMORY=1 adds tracemalloc peaks, which slows
+# everything down) or from the Settings page. Traces go to a ring buffer
+# of the last BUFFER_SIZE calls, shared by every session of the process.
+
+ENABLED = os.environ.get("SLEEP_PERF", "0") != "0"
+MEMORY = os.environ.get("SLEEP_PERF_MEMORY", "0") != "0"
+BUFFER_SIZE = 5000
+
+TRACES: deque = deque(maxlen=BUFFER_SIZE)
+_LOCAL = threading.local()         # span nesting depth per thread
+
+
+def enable(memory: bool = False) -> None:
+    global ENABLED, MEMORY
+    ENABLED, MEMORY = True, memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def disable() -> None:
+    global ENABLED, MEMORY
+    ENABLED, MEMORY = False, False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def clear() -> None:
+    TRACES.clear()
+
+
+if MEMORY:
+    enable(memory=True)
+
+
+@contextmanager
+def span(op: str, rows=None):
+    """
+    Time the block as `op`. Yields a dict whose "rows" the block may set.
+    Peak memory is only taken for outermost spans (tracemalloc has one
+    peak counter, which nested spans would reset).
+    """
+    if not ENABLED:
+        yield {}
+        return
+    depth = getattr(_LOCAL, "depth", 0)
+    _LOCAL.depth = depth + 1
+    memory = MEMORY and depth == 0 and tracemalloc.is_tracing()
+    if memory:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    info = {"rows": rows}
+    began = time.perf_counter()
+    try:
+        yield info
+    finally:
+        ms = (time.perf_counter() - began) * 1000
+        _LOCAL.depth = depth
+        TRACES.append({
+            "op": op,
+            "at": time.time(),
+            "ms": ms,
+            "rows": info.get("rows"),
+            "peak_kb": ((tracemalloc.get_traced_memory()[1] - base) / 1024
+                        if memory else None),
+            "depth": depth,
+            "thread": threading.current_thread().name,
+        })
+
+
+def _rows(args, result):
+    """Rows a call handled: a DataFrame result or argument, or a count."""
+    for obj in (result, *args[:1]):
+        if isinstance(obj, pd.DataFrame):
+            return len(obj)
+    if isinstance(result, int) and not isinstance(result, bool):
+        return result
+    if isinstance(result, tuple) and all(isinstance(x, int) for x in result):
+        return sum(result)              # e.g. upsert → (inserted, updated)
+    return None
+
+
+def timed(fn=None, *, name: str = None):
+    """Decorator: record each call as "<module>.<function>" (or `name`)."""
+    def wrap(fn):
+        op = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with span(op) as info:
+                result = fn(*args, **kwargs)
+                info["rows"] = _rows(args, result)
+                return result
+        return inner
+    return wrap(fn) if fn is not None else wrap
+
+
+# ── Page reruns ───────────────────────────────────────────────────────────
+@contextmanager
+def page_run(name: str):
+    """
+    Wrap a page script's body: records the rerun's wall time as
+    "page.<name>", also when st.stop() / st.rerun() end it early.
+    """
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        if ENABLED:
+            TRACES.append({"op": f"page.{name}", "at": time.time(),
+                           "ms": (time.perf_counter() - began) * 1000,
+                           "rows": None, "peak_kb": None, "depth": 0,
+                           "thread": threading.current_thread().name})
+
+
+# ── Reports ───────────────────────────────────────────────────────────────
+def summary() -> pd.DataFrame:
+    """Calls, p50/p95/max latency, rows and peak memory per operation."""
+    df = pd.DataFrame(list(TRACES),
+                      columns=["op", "at", "ms", "rows", "peak_kb", "depth", "thread"])
+    if df.empty:
+        return pd.DataFrame(columns=["op", "calls", "p50_ms", "p95_ms",
+                                     "max_ms", "rows", "peak_kb"])
+    ms = df.groupby("op")["ms"]
+    out = pd.DataFrame({
+        "calls": ms.size(),
+        "p50_ms": ms.quantile(0.5),
+        "p95_ms": ms.quantile(0.95),
+        "max_ms": ms.max(),
+        "rows": pd.to_numeric(df["rows"]).groupby(df["op"]).median(),
+        "peak_kb": pd.to_numeric(df["peak_kb"]).groupby(df["op"]).max(),
+    })
+    return out.sort_values("p95_ms", ascending=False).reset_index()
+
+
+def export_json() -> str:
+    """The ring buffer as JSON (one object per call, oldest first)."""
+    return json.dumps(list(TRACES), indent=1,
+                      default=lambda v: None if v is pd.NA else
+                      v.item() if isinstance(v, np.generic) else str(v))
@@ -0,0 +1,36 @@
+# utils/prewarm.py
+import importlib
+import os
+import threading
+
+# ── Background pre-warm ───────────────────────────────────────────────────
+# Pages import their heavy libraries on first use. Once a page has been
+# drawn, prewarm() imports the rest in a daemon thread, so switching to
+# Prediction or Charts later doesn't pay for scikit-learn / plotly.
+# Turn it off with SLEEP_PREWARM=0 (e.g. on a memory-starved container).
+
+ENABLED = os.environ.get("SLEEP_PREWARM", "1") != "0"
+MODULES = [
+    "plotly.express",
+    "plotly.graph_objects",
+    "joblib",
+    "sklearn.neighbors",
+]
+
+_STARTED = threading.Event()
+
+
+def _import_all() -> None:
+    for name in MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass                   # the page that needs it will raise
+
+
+def prewarm() -> None:
+    """Start importing MODULES in the background (once per process)."""
+    if not ENABLED or _STARTED.is_set():
+        return
+    _STARTED.set()
+    threading.Thread(target=_import_all, name="prewarm", daemon=True).start()
@@ -0,0 +1,158 @@
+# utils/rollups.py
+import os
+import threading
+import pandas as pd
+from .data_io import DATA_DIR, COLUMNS, data_version, load
+
+# ── Materialised day / week / month aggregates ────────────────────────────
+# Dashboards read these tables instead of scanning the raw log. They are
+# stamped with the data_version() they describe and kept in step by the
+# write path (data_io calls refresh()): an append or upsert recomputes
+# only the buckets its rows fall into; anything else (overwrite, import,
+# another process writing) makes the next reader rebuild them in one pass.
+# The tables are also pickled to ROLLUP_PATH, so a restart with unchanged
+# data doesn't need to parse the log at all.
+
+ROLLUP_PATH = DATA_DIR / "rollups.pkl"
+
+LEVELS = {"day": "D", "week": "W", "month": "M"}    # W = ISO week (Mon–Sun)
+SPANS = {"day": pd.DateOffset(days=1), "week": pd.DateOffset(weeks=1),
+         "month": pd.DateOffset(months=1)}
+SCORE_COLS = ["physical_recovery", "mental_recovery",
+              "sleep_cycle", "sleep_score"]
+FIRST_COLS = ["start_time", "end_time", *SCORE_COLS, "sleep_duration"]
+
+_STATE: dict = {}                  # {"version": …, "day"/"week"/"month": df}
+_LOCK = threading.RLock()
+
+
+def _bucket(start: pd.Series, level: str) -> pd.Series:
+    """Bucket (period start) of each start_time at `level`."""
+    if level == "day":
+        return start.dt.normalize()
+    return start.dt.to_period(LEVELS[level]).dt.start_time
+
+
+def _aggregate(df: pd.DataFrame, level: str) -> pd.DataFrame:
+    """Aggregates of `df` per bucket; day rows also carry the first sleep."""
+    df = df.dropna(subset=["start_time"])
+    key = _bucket(pd.to_datetime(df["start_time"]), level).rename(level)
+    frame = df[["sleep_duration", *SCORE_COLS]].astype("float64")
+    g = frame.groupby(key)
+
+    out = pd.DataFrame({
+        "nights":          g.size(),
+        "duration_count":  g["sleep_duration"].count(),
+        "duration_sum":    g["sleep_duration"].sum(),
+        "duration_mean":   g["sleep_duration"].mean(),
+        "duration_median": g["sleep_duration"].median(),
+    })
+    for c in SCORE_COLS:
+        out[f"{c}_mean"] = g[c].mean()
+
+    if level == "day":
+        # whole first row of each day (not per-column firsts)
+        first = (df.assign(**{level: key})
+                   .sort_values("start_time", kind="stable")
+                   .drop_duplicates(level)
+                   .set_index(level)[FIRST_COLS])
+        out = out.join(first.add_prefix("first_"))
+    return out
+
+
+def _build(df: pd.DataFrame) -> dict:
+    return {level: _aggregate(df, level) for level in LEVELS}
+
+
+def _persist(state: dict) -> None:
+    tmp = ROLLUP_PATH.with_name(ROLLUP_PATH.name + ".tmp")
+    pd.to_pickle(state, tmp)
+    os.replace(tmp, ROLLUP_PATH)
+
+
+def _restore() -> dict:
+    """Tables from ROLLUP_PATH ({} when missing or unreadable)."""
+    try:
+        return pd.read_pickle(ROLLUP_PATH)
+    except Exception:
+        return {}
+
+
+def _current() -> dict:
+    """Up-to-date tables: memory, else ROLLUP_PATH, else one full rebuild."""
+    version = data_version()
+    with _LOCK:
+        if "version" not in _STATE or _STATE["version"] != version:
+            _STATE.clear()
+            _STATE.update(_restore())
+        if "version" not in _STATE or _STATE["version"] != version:
+            _STATE.clear()
+            _STATE.update(_build(load()), version=version)
+            _persist(_STATE)
+        return dict(_STATE)
+
+
+def refresh(before, rows: pd.DataFrame = None) -> None:
+    """
+    Called after a write that moved the data from version `before`.
+    `rows` are the rows it added or changed: only their day / week /
+    month buckets are recomputed. rows=None means anything may have
+    changed – the tables are dropped and rebuilt on next read.
+    """
+    with _LOCK:
+        if not _STATE:
+            _STATE.update(_restore())
+        if rows is None or "day" not in _STATE \
+                or _STATE.get("version") != before:       # none built yet
+            _STATE.clear()
+            ROLLUP_PATH.unlink(missing_ok=True)
+            return
+
+        version = data_version()
+        start = rows["start_time"].dropna()
+        if len(start):
+            # raw rows of every touched bucket (weeks can straddle months)
+            lo = min(_bucket(start, lv).min() for lv in LEVELS)
+            hi = max(_bucket(start, lv).max() + SPANS[lv] for lv in LEVELS)
+            raw = load(start=lo, end=hi)
+            for level in LEVELS:
+                dirty = _bucket(start, level).unique()
+                part = raw[_bucket(raw["start_time"], level).isin(dirty)]
+                table = _STATE[level].drop(dirty, errors="ignore")
+                _STATE[level] = pd.concat(
+                    [table, _aggregate(part, level)]).sort_index()
+        _STATE["version"] = version
+        _persist(_STATE)
+
+
+# ── Readers ───────────────────────────────────────────────────────────────
+def rollup(level: str = "day", start=None, end=None) -> pd.DataFrame:
+    """Aggregates per day / week / month with bucket start in [start, end)."""
+    df = _current()[level]
+    if start is not None:
+        df = df[df.index >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df.index < pd.Timestamp(end)]
+    return df.copy(deep=False)
+
+
+def totals() -> dict:
+    """Whole-log figures from the monthly table (a few rows per year)."""
+    m = rollup("month")
+    count = m["duration_count"].sum()
+    return {
+        "nights": int(m["nights"].sum()),
+        "duration_mean": m["duration_sum"].sum() / count if count else None,
+    }
+
+
+def first_per_day(start=None, end=None) -> pd.DataFrame:
+    """
+    First sleep of each day (by start_time) as COLUMNS-named rows plus
+    date_only – the per-day view History and Settings build on.
+    """
+    day = rollup("day", start, end)
+    first = (day[[f"first_{c}" for c in FIRST_COLS]]
+             .rename(columns=lambda c: c.removeprefix("first_")))
+    out = first.rename_axis("date_only").reset_index()
+    return out[["date_only"] + [c for c in COLUMNS if c in FIRST_COLS]]
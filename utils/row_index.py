@@ -0,0 +1,125 @@
+# utils/row_index.py
+import os
+import threading
+import numpy as np
+import pandas as pd
+from .data_io import DATA_DIR, KEY_COLS, VALUE_COLS, data_version, load
+
+# ── Hash index of the sleep log ───────────────────────────────────────────
+# One entry per (start_time, end_time): a 64-bit hash of the key → the
+# row's values (float32, NaN = blank). Imports look every incoming row up
+# in it (a hash-table probe, O(1) per row) and compare values the way
+# upsert() does – blank incoming values never count as a change – to tell
+# new, changed and identical rows apart without reading the log; only
+# the first two get written.
+# Like utils.rollups it is stamped with the data_version() it describes,
+# kept in step by the write path (data_io calls refresh(), which only
+# queues the written rows), rebuilt in one pass when stale and pickled to
+# INDEX_PATH across restarts when an import next uses it.
+
+INDEX_PATH = DATA_DIR / "row_index.pkl"
+
+NEW, CHANGED, SAME = 0, 1, 2
+
+_STATE: dict = {}                  # {"version", "index", "pending", "saved"}
+_LOCK = threading.RLock()
+
+
+def key_hashes(df: pd.DataFrame) -> np.ndarray:
+    """64-bit hash of (start_time, end_time) per row."""
+    keys = df[KEY_COLS].astype("datetime64[ns]")
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def _values(df: pd.DataFrame) -> np.ndarray:
+    """VALUE_COLS of a schema-shaped frame as float32, NaN for blanks."""
+    return df[VALUE_COLS].astype("float32").to_numpy(na_value=np.nan)
+
+
+def _build(df: pd.DataFrame) -> pd.DataFrame:
+    """Values by key hash; first row wins for repeated keys (as upsert)."""
+    df = df.dropna(subset=KEY_COLS)
+    index = pd.DataFrame(_values(df), index=key_hashes(df), columns=VALUE_COLS)
+    return index[~index.index.duplicated()]
+
+
+def _persist(state: dict) -> None:
+    state["saved"] = True
+    tmp = INDEX_PATH.with_name(f"{INDEX_PATH.name}.{os.getpid()}.tmp")
+    pd.to_pickle(state, tmp)
+    os.replace(tmp, INDEX_PATH)
+
+
+def _restore() -> dict:
+    """Index from INDEX_PATH ({} when missing or unreadable)."""
+    try:
+        return pd.read_pickle(INDEX_PATH)
+    except Exception:
+        return {}
+
+
+def _current() -> pd.DataFrame:
+    """Up-to-date index: memory, else INDEX_PATH, else one full rebuild."""
+    version = data_version()
+    with _LOCK:
+        if "version" not in _STATE or _STATE["version"] != version:
+            _STATE.clear()
+            _STATE.update(_restore())
+        if "version" not in _STATE or _STATE["version"] != version:
+            _STATE.clear()
+            _STATE.update(index=_build(load()), version=version)
+        for added, changed in _STATE.pop("pending", []):
+            _STATE["index"] = _fold(_STATE["index"], added, changed)
+        if not _STATE.get("saved"):
+            _persist(_STATE)
+        return _STATE["index"]
+
+
+def classify(df: pd.DataFrame) -> np.ndarray:
+    """NEW / CHANGED / SAME for each row of a schema-shaped frame."""
+    index = _current()
+    pos = index.index.get_indexer(key_hashes(df))
+    known = pos >= 0
+    new, old = _values(df[known]), index.to_numpy()[pos[known]]
+    with np.errstate(invalid="ignore"):
+        diff = ~np.isnan(new) & ~(new == old)       # as upsert: blanks keep
+    out = np.full(len(df), NEW)
+    out[known] = np.where(diff.any(axis=1), CHANGED, SAME)
+    out[df[KEY_COLS].isna().any(axis=1).to_numpy()] = NEW     # never match
+    return out
+
+
+def _fold(index: pd.DataFrame, added: pd.DataFrame,
+          changed: pd.DataFrame) -> pd.DataFrame:
+    """Index after a write that inserted `added` and updated `changed`."""
+    if len(added):                      # first row per key wins, as in upsert
+        new = _build(added)
+        index = pd.concat([index, new[index.index.get_indexer(new.index) < 0]])
+    if len(changed):                    # keys indexed by now: new values
+        new = _build(changed)
+        pos = index.index.get_indexer(new.index)
+        values = index.to_numpy().copy()
+        values[pos[pos >= 0]] = new.to_numpy()[pos >= 0]
+        index = pd.DataFrame(values, index=index.index, columns=VALUE_COLS)
+    return index
+
+
+def refresh(before, added: pd.DataFrame = None,
+            changed: pd.DataFrame = None) -> None:
+    """
+    Called after a write that moved the data from version `before`:
+    `added` rows were inserted, `changed` rows (their values as stored
+    now) updated. They are queued and folded in on the next classify(),
+    so saves stay cheap. None means anything may have changed – the
+    index is dropped and rebuilt on next use.
+    """
+    with _LOCK:
+        if not _STATE:
+            _STATE.update(_restore())
+        if added is None or changed is None or "index" not in _STATE \
+                or _STATE.get("version") != before:     # none built yet
+            _STATE.clear()
+            INDEX_PATH.unlink(missing_ok=True)
+            return
+        _STATE.setdefault("pending", []).append((added, changed))
+        _STATE.update(version=data_version(), saved=False)
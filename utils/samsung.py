@@ -0,0 +1,231 @@
+# utils/samsung.py
+import io
+import json
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from .data_io import COLUMNS, DATA_DIR, KEY_COLS, TZ, merge_rows
+from .locking import atomic_write, file_lock
+from . import sensors
+
+# ── Samsung Health export folders → sleep log + sensor stores ─────────────
+# A full export ("Download personal data") is a folder – or its zip – with
+# one CSV per data type, e.g. com.samsung.shealth.sleep.<export time>.csv.
+# Each CSV starts with a metadata line, column names carry a
+# "com.samsung.health.<type>." prefix, times are naïve UTC and
+# sleep_duration is in minutes. Every file is parsed in a worker process
+# and converted once (UTC → Asia/Taipei, minutes → hours); only rows
+# created after the previous import (a create_time high-water mark per
+# data type, kept in MARKS_PATH) are parsed further and written.
+
+MARKS_PATH = DATA_DIR / "samsung_import.json"   # {kind: last create_time, UTC}
+LOCK_PATH = DATA_DIR / "samsung_import.lock"    # one import at a time
+CHUNK_BYTES = 16 * 1024 * 1024    # big CSVs are split into jobs of this size
+
+KINDS = {
+    "sleep": re.compile(r"com\.samsung\.shealth\.sleep\.\d+\.csv"),
+    "heart_rate": re.compile(
+        r"com\.samsung\.shealth\.tracker\.heart_rate\.\d+\.csv"),
+    "stress": re.compile(r"com\.samsung\.shealth\.stress\.\d+\.csv"),
+}
+SLEEP_VALUES = ["physical_recovery", "mental_recovery",
+                "sleep_cycle", "sleep_score"]
+
+
+def _short(col: str) -> str:
+    """"com.samsung.health.sleep.start_time" → "start_time"."""
+    return col.strip().rsplit(".", 1)[-1]
+
+
+def _wanted(kind: str) -> set:
+    """Short names of the columns `kind` is parsed from."""
+    if kind == "sleep":
+        return {*KEY_COLS, "create_time", "sleep_duration", *SLEEP_VALUES}
+    return {"create_time", *map(_short, sensors.source_columns(kind))}
+
+
+# ── Discovery ─────────────────────────────────────────────────────────────
+
+
+def find_files(path: Path) -> list[tuple]:
+    """(kind, file, zip member or None) for every known CSV in an export."""
+    path = Path(path)
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            names = [(Path(n).name, path, n) for n in zf.namelist()]
+    else:
+        names = [(p.name, p, None) for p in path.rglob("*.csv")]
+    return sorted((kind, file, member)
+                  for name, file, member in names
+                  for kind, pattern in KINDS.items()
+                  if pattern.fullmatch(name))
+
+
+def _header(fh) -> tuple[bytes, int]:
+    """Read past the metadata line (if any) → (column header, its offset)."""
+    pos, line = 0, fh.readline()
+    first = line.lstrip(b"\xef\xbb\xbf").decode(errors="replace")
+    if first.startswith("com.samsung.") and first.count(",") < 3:
+        pos, line = fh.tell(), fh.readline()
+    return line, pos
+
+
+def _chunks(file: Path) -> list[tuple]:
+    """Byte ranges of a plain CSV's data rows, about CHUNK_BYTES each."""
+    size = file.stat().st_size
+    with open(file, "rb") as fh:
+        _header(fh)
+        start = fh.tell()
+    if size - start <= CHUNK_BYTES:
+        return [None]
+    return [(lo, min(lo + CHUNK_BYTES, size))
+            for lo in range(start, size, CHUNK_BYTES)]
+
+
+def _read_csv(file: Path, member: str | None, wanted: set,
+              span: tuple = None) -> pd.DataFrame:
+    """
+    One export CSV → its wanted columns under their short names. With
+    `span` (lo, hi), only the rows starting inside that byte range.
+    """
+    with ExitStack() as stack:
+        fh = stack.enter_context(
+            stack.enter_context(zipfile.ZipFile(file)).open(member)
+            if member else open(file, "rb"))
+        header, pos = _header(fh)
+        if span:
+            lo, hi = span
+            fh.seek(lo - 1)
+            fh.readline()               # rest of the row begun before lo
+            rows = b""
+            if fh.tell() < hi:          # up to hi - 1, then finish that row
+                rows = fh.read(hi - 1 - fh.tell()) + fh.readline()
+            fh = io.BytesIO(header + rows)
+        else:
+            fh.seek(pos)
+        df = pd.read_csv(fh, index_col=False,
+                         encoding="utf-8-sig", low_memory=False,
+                         usecols=lambda c: _short(c) in wanted)
+    df.columns = [_short(c) for c in df.columns]
+    return df.loc[:, ~df.columns.duplicated()]
+
+
+def _col(raw: pd.DataFrame, name: str) -> pd.Series:
+    """Column `name`, or all-NA when this export doesn't have it."""
+    return raw[name] if name in raw else pd.Series(np.nan, index=raw.index)
+
+
+def _utc(col) -> pd.Series:
+    """Samsung's naïve UTC strings → naïve UTC Timestamps."""
+    return pd.to_datetime(col, errors="coerce")
+
+
+def _to_local(col: pd.Series) -> pd.Series:
+    """Naïve UTC → naïve Asia/Taipei (the log's convention)."""
+    return col.dt.tz_localize("UTC").dt.tz_convert(TZ.key).dt.tz_localize(None)
+
+
+def _sleep_rows(raw: pd.DataFrame) -> pd.DataFrame:
+    """Export rows → COLUMNS-shaped sleep log rows."""
+    out = pd.DataFrame(index=raw.index)
+    for c in KEY_COLS + ["create_time"]:
+        out[c] = _to_local(_utc(_col(raw, c)))
+    for c in SLEEP_VALUES:
+        out[c] = pd.to_numeric(_col(raw, c), errors="coerce")
+    minutes = pd.to_numeric(_col(raw, "sleep_duration"), errors="coerce")
+    span = (out["end_time"] - out["start_time"]).dt.total_seconds() / 3600.0
+    out["sleep_duration"] = (minutes / 60.0).round(2).fillna(span.round(2))
+    return out.dropna(subset=KEY_COLS).reindex(columns=COLUMNS)
+
+
+def _parse_file(job: tuple) -> tuple:
+    """
+    Worker: parse one export file (or byte range of it), keeping rows
+    created after `mark`.
+    Returns (kind, sleep rows or store columns, rows kept, newest
+    create_time kept as naïve UTC or None).
+    """
+    kind, file, member, span, mark = job
+    raw = _read_csv(file, member, _wanted(kind), span)
+    created = _utc(_col(raw, "create_time"))
+    if mark is not None:
+        keep = (created > pd.Timestamp(mark)).to_numpy()
+        raw, created = raw[keep], created[keep]
+    newest = created.max()
+    newest = None if pd.isna(newest) else newest.isoformat()
+    if kind == "sleep":
+        return kind, _sleep_rows(raw), len(raw), newest
+    full = {_short(c): c for c in sensors.source_columns(kind)}
+    return kind, sensors.to_arrays(kind, raw.rename(columns=full)), \
+        len(raw), newest
+
+
+# ── Import ────────────────────────────────────────────────────────────────
+
+
+def high_water_marks() -> dict:
+    """{kind: newest create_time imported (naïve UTC ISO)}."""
+    try:
+        return json.loads(MARKS_PATH.read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def _save_marks(marks: dict) -> None:
+    """Replace MARKS_PATH atomically."""
+    atomic_write(MARKS_PATH,
+                 lambda tmp: tmp.write_text(json.dumps(marks, indent=2)))
+
+
+def import_export(path, workers=None, force=False) -> dict:
+    """
+    Import a Samsung Health export folder or zip: sleep sessions are
+    merged into the log (merge_rows), heart-rate/stress samples merged into the
+    sensor stores. Only rows newer than the last import are written,
+    unless `force`. `workers` processes parse the files (None: one per
+    CPU, 1: in this process). Returns {kind: {"files", "rows", "added"}}.
+    """
+    files = find_files(path)
+    if not files:
+        raise ValueError(f"No Samsung Health CSVs found in {path}")
+    with file_lock(LOCK_PATH):
+        marks = {} if force else high_water_marks()
+        jobs = [(kind, file, member, span, marks.get(kind))
+                for kind, file, member in files
+                for span in ([None] if member else _chunks(file))]
+        workers = workers or min(len(jobs), os.cpu_count() or 1)
+        if workers == 1:
+            parsed = list(map(_parse_file, jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = list(pool.map(_parse_file, jobs))
+
+        report, marks = {}, high_water_marks()
+        for kind in KINDS:
+            done = [p for p in parsed if p[0] == kind]
+            if not done:
+                continue
+            rows = sum(p[2] for p in done)
+            added = 0
+            if kind == "sleep":
+                df = pd.concat([p[1] for p in done], ignore_index=True)
+                if len(df):
+                    added = sum(merge_rows(df)[:2])
+            elif rows:
+                cols = {n: np.concatenate([p[1][n] for p in done])
+                        for n in done[0][1]}
+                added = sensors.extend(kind, cols)
+            # the mark only moves once the rows behind it are written
+            newest = [pd.Timestamp(t) for t in
+                      [p[3] for p in done] + [marks.get(kind)] if t]
+            if newest:
+                marks[kind] = max(newest).isoformat()
+            report[kind] = {"files": sum(f[0] == kind for f in files),
+                            "rows": rows, "added": added}
+        _save_marks(marks)
+    return report
@@ -0,0 +1,336 @@
+# utils/sensors.py
+import os
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from .data_io import DATA_DIR, TZ, data_version, load, _between
+from .locking import file_lock
+
+# ── Samsung Health sensor exports → memory-mapped arrays ──────────────────
+# Each series is stored as one .npy file per column under data/sensors/:
+#   ts.npy   int64 epoch seconds (UTC), sorted ascending
+#   end.npy  int64 epoch seconds (window sources only, e.g. stress)
+#   <v>.npy  uint8 values (bpm, stress score, …)
+# Reads memory-map those files, so nothing is parsed or copied, and a
+# time-range slice is a binary search over ts.
+
+SENSOR_DIR = DATA_DIR / "sensors"
+LOCK_PATH = SENSOR_DIR / "sensors.lock"       # held while a store is rewritten
+HR_CSV = DATA_DIR / "samsung health heart rate data.csv"
+STRESS_CSV = DATA_DIR / "samsung health stress data.csv"
+
+SOURCES = {
+    "heart_rate": {
+        "csv": HR_CSV,
+        "time": "com.samsung.health.heart_rate.create_time",
+        "end": None,
+        "values": {"bpm": "com.samsung.health.heart_rate.heart_rate"},
+    },
+    "stress": {
+        "csv": STRESS_CSV,
+        "time": "start_time",
+        "end": "end_time",
+        "values": {"score": "score", "min": "min", "max": "max"},
+    },
+}
+
+REST_WINDOW = 5                    # samples in the resting-HR rolling mean
+SENSOR_COLS = ["hr_mean", "hr_min", "hr_rest", "stress_mean", "stress_max"]
+ANNOTATED_ITEMS = 8                # annotated frames kept per data version
+
+_OPEN: dict = {}                   # {(kind, ts.npy mtime): TimeSeries}
+_ANNOTATED: dict = {}              # {(versions, start, end): DataFrame}
+_LOCK = threading.Lock()
+
+
+def to_epoch(when) -> int:
+    """Naïve Asia/Taipei (the app's convention) or aware time → UTC epoch s."""
+    ts = pd.Timestamp(when)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize(TZ)
+    return int(ts.timestamp())
+
+
+class TimeSeries:
+    """Sorted sensor samples; `ts` (and `end`) are int64 UTC epoch seconds."""
+
+    def __init__(self, arrays: dict):
+        self.arrays = arrays
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    @property
+    def ts(self) -> np.ndarray:
+        return self.arrays["ts"]
+
+    def between(self, start=None, end=None) -> "TimeSeries":
+        """Samples with start <= ts < end – O(log n), returns views."""
+        lo = 0 if start is None else np.searchsorted(self.ts, to_epoch(start), "left")
+        hi = len(self) if end is None else np.searchsorted(self.ts, to_epoch(end), "left")
+        return TimeSeries({k: v[lo:hi] for k, v in self.arrays.items()})
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materialise as a DataFrame with naïve local timestamps."""
+        df = pd.DataFrame({k: np.asarray(v) for k, v in self.arrays.items()})
+        for c in ("ts", "end"):
+            if c in df.columns:
+                df[c] = (pd.to_datetime(df[c], unit="s", utc=True)
+                         .dt.tz_convert(TZ.key).dt.tz_localize(None))
+        return df
+
+
+def _utc_epoch(col: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Samsung's naïve UTC strings → (int64 epoch seconds, unparsable mask)."""
+    dt = pd.to_datetime(col, errors="coerce")
+    return dt.to_numpy(dtype="datetime64[s]").astype("int64"), dt.isna().to_numpy()
+
+
+def ingest(kind: str, force: bool = False) -> Path:
+    """
+    Convert one Samsung export CSV into the .npy column store (only when
+    the CSV is newer than the store, unless `force`). Returns its folder,
+    or None when there is neither a CSV nor a store.
+    """
+    src = SOURCES[kind]
+    out = SENSOR_DIR / kind
+    stamp = out / "ts.npy"
+    if not src["csv"].exists():
+        return out if stamp.exists() else None
+    if not force and stamp.exists() \
+            and stamp.stat().st_mtime >= src["csv"].stat().st_mtime:
+        return out
+
+    raw = pd.read_csv(src["csv"], usecols=source_columns(kind))
+    with file_lock(LOCK_PATH):
+        _save(kind, to_arrays(kind, raw))
+    return out
+
+
+def source_columns(kind: str) -> list[str]:
+    """Export CSV columns a store of `kind` is built from."""
+    src = SOURCES[kind]
+    return [src["time"]] + ([src["end"]] if src["end"] else []) \
+        + list(src["values"].values())
+
+
+def to_arrays(kind: str, raw: pd.DataFrame) -> dict:
+    """Export rows → store columns, sorted by ts, unparsable rows dropped."""
+    src = SOURCES[kind]
+    ts, bad = _utc_epoch(raw[src["time"]])
+    cols = {"ts": ts}
+    if src["end"]:
+        cols["end"], bad_end = _utc_epoch(raw[src["end"]])
+        bad |= bad_end
+    for name, col in src["values"].items():
+        v = pd.to_numeric(raw[col], errors="coerce")
+        bad |= v.isna().to_numpy()
+        cols[name] = v.fillna(0).clip(0, 255).to_numpy(dtype="uint8")
+
+    order = np.argsort(cols["ts"][~bad], kind="stable")
+    return {name: col[~bad][order] for name, col in cols.items()}
+
+
+def _save(kind: str, cols: dict) -> None:
+    """Write a store's columns; ts.npy goes last – its mtime marks it complete."""
+    out = SENSOR_DIR / kind
+    out.mkdir(parents=True, exist_ok=True)
+    for name in sorted(cols, key=lambda n: n == "ts"):
+        tmp = out / f"{name}.tmp.npy"
+        np.save(tmp, cols[name])
+        os.replace(tmp, out / f"{name}.npy")
+
+
+def extend(kind: str, cols: dict) -> int:
+    """
+    Merge new samples (ts[, end] epoch seconds + value arrays, as in the
+    store) into the store of `kind`, skipping ones it already holds.
+    Returns how many samples were added. A newer export CSV re-ingested
+    later replaces the store, including samples merged here.
+    """
+    with file_lock(LOCK_PATH):
+        cur = open_series(kind)
+        names = list(cur.arrays)
+        new = pd.DataFrame({n: np.asarray(cols[n]).astype(cur[n].dtype)
+                            for n in names}).drop_duplicates()
+        if new.empty:
+            return 0
+        # only stored samples in the new time range can be duplicates
+        lo = np.searchsorted(cur.ts, new["ts"].min(), "left")
+        hi = np.searchsorted(cur.ts, new["ts"].max(), "right")
+        near = pd.DataFrame({n: np.asarray(cur[n][lo:hi]) for n in names})
+        seen = new.merge(near.drop_duplicates(), how="left", on=names,
+                         indicator=True)["_merge"] == "both"
+        new = new[~seen.to_numpy()]
+        if new.empty:
+            return 0
+        merged = {n: np.concatenate([np.asarray(cur[n]), new[n].to_numpy()])
+                  for n in names}
+        order = np.argsort(merged["ts"], kind="stable")
+        _save(kind, {n: col[order] for n, col in merged.items()})
+    return len(new)
+
+
+def _mmap(path: Path) -> np.ndarray:
+    """Read-only memory map (plain load for empty arrays, which can't map)."""
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        return np.load(path)
+
+
+def _store_key(kind: str):
+    """Version of a sensor store (mtime of its ts.npy), None if absent."""
+    stamp = SENSOR_DIR / kind / "ts.npy"
+    return stamp.stat().st_mtime_ns if stamp.exists() else None
+
+
+def open_series(kind: str) -> TimeSeries:
+    """Memory-mapped series for `kind` (ingesting the CSV on first use)."""
+    names = ["ts"] + (["end"] if SOURCES[kind]["end"] else []) \
+        + list(SOURCES[kind]["values"])
+    if ingest(kind) is None:        # nothing exported yet → empty series
+        return TimeSeries({n: np.empty(0, "int64" if n in ("ts", "end")
+                                       else "uint8") for n in names})
+    folder = SENSOR_DIR / kind
+    key = (kind, _store_key(kind))
+    with _LOCK:
+        series = _OPEN.get(key)
+        if series is None:
+            series = TimeSeries({n: _mmap(folder / f"{n}.npy") for n in names})
+            for k in [k for k in _OPEN if k[0] == kind]:
+                del _OPEN[k]
+            _OPEN[key] = series
+    return series
+
+
+def heart_rate(start=None, end=None) -> TimeSeries:
+    """Heart-rate samples (bpm) with start <= time < end."""
+    return open_series("heart_rate").between(start, end)
+
+
+def stress(start=None, end=None) -> TimeSeries:
+    """Stress windows (score/min/max) whose start lies in [start, end)."""
+    return open_series("stress").between(start, end)
+
+
+# ── Interval join: sleep sessions × sensor samples ────────────────────────
+# Every statistic is a range reduction over the sorted samples: the range
+# of session i is [lo[i], hi[i]) from np.searchsorted, sums come from a
+# prefix sum and min/max from ufunc.reduceat. Cost is O((n + m) log n)
+# for m sessions and n samples, with no per-session filtering.
+
+
+def _range_reduce(ufunc, values: np.ndarray, lo: np.ndarray, hi: np.ndarray):
+    """ufunc over values[lo:hi] per range (garbage where lo >= hi – mask it)."""
+    if not len(values) or not len(lo):
+        return np.zeros(len(lo), dtype=values.dtype)
+    padded = np.append(values, values[-1:])          # lets hi == len(values)
+    idx = np.column_stack([np.minimum(lo, len(values) - 1),
+                           np.minimum(hi, len(values))]).ravel()
+    return ufunc.reduceat(padded, idx)[::2]
+
+
+def _mean(prefix: np.ndarray, lo: np.ndarray, hi: np.ndarray, n: np.ndarray):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, (prefix[hi] - prefix[lo]) / n, np.nan)
+
+
+def _session_epochs(df: pd.DataFrame):
+    """start/end (naïve local) → int64 UTC epoch seconds + validity mask."""
+    def epoch(col):
+        # UTC offsets only change on the hour: localise each distinct hour
+        # once instead of every timestamp
+        col = pd.to_datetime(col)
+        codes, hours = pd.factorize(col.dt.floor("h"))
+        hours = pd.DatetimeIndex(hours)
+        utc = hours.tz_localize(TZ, nonexistent="shift_forward", ambiguous="NaT")
+        off = (utc.tz_convert("UTC").tz_localize(None) - hours) \
+            .to_numpy(dtype="timedelta64[s]")
+        off = np.append(off, np.timedelta64("NaT"))     # code -1 → NaT
+        secs = col.to_numpy(dtype="datetime64[s]") + off[codes]
+        return secs.astype("int64"), ~np.isnat(secs)
+    s, s_ok = epoch(df["start_time"])
+    e, e_ok = epoch(df["end_time"])
+    ok = s_ok & e_ok
+    return np.where(ok, s, 0), np.where(ok, e, 0), ok
+
+
+def annotate(df: pd.DataFrame, hr: TimeSeries = None,
+             st: TimeSeries = None) -> pd.DataFrame:
+    """
+    Add per-session sensor features to a load()-shaped frame:
+      hr_mean, hr_min      heart rate during start_time–end_time
+      hr_rest              lowest REST_WINDOW-sample rolling mean in the
+                           session (falls back to hr_min for short ones)
+      stress_mean/_max     score of the stress windows overlapping it
+    """
+    hr = open_series("heart_rate") if hr is None else hr
+    st = open_series("stress") if st is None else st
+    s, e, ok = _session_epochs(df)
+
+    # Heart rate: samples with s <= ts < e
+    ts, bpm = np.asarray(hr.ts), np.asarray(hr["bpm"]).astype("int64")
+    lo = np.searchsorted(ts, s, "left")
+    hi = np.maximum(np.searchsorted(ts, e, "left"), lo)
+    n = np.where(ok, hi - lo, 0)
+    prefix = np.concatenate([[0], np.cumsum(bpm)])
+    hr_mean = _mean(prefix, lo, hi, n)
+    hr_min = _range_reduce(np.minimum, bpm, lo, hi)
+
+    w = REST_WINDOW                 # rolling means fully inside the session
+    roll = (prefix[w:] - prefix[:-w]) / w if len(bpm) >= w else np.empty(0)
+    roll_hi = np.maximum(hi - w + 1, lo)
+    hr_rest = np.where(n >= w, _range_reduce(np.minimum, roll, lo, roll_hi),
+                       hr_min)
+
+    # Stress: hourly windows overlapping [s, e) → start < e and end > s
+    w_start, w_end = np.asarray(st.ts), np.asarray(st["end"])
+    score = np.asarray(st["score"]).astype("int64")
+    run_end = np.maximum.accumulate(w_end) if len(w_end) else w_end
+    slo = np.searchsorted(run_end, s, "right")
+    shi = np.maximum(np.searchsorted(w_start, e, "left"), slo)
+    sn = np.where(ok, shi - slo, 0)
+    sprefix = np.concatenate([[0], np.cumsum(score)])
+    stress_mean = _mean(sprefix, slo, shi, sn)
+    stress_max = _range_reduce(np.maximum, score, slo, shi)
+
+    out = df.copy(deep=False)
+    out["hr_mean"] = hr_mean.astype("float32")
+    out["hr_min"] = pd.Series(hr_min, index=df.index).where(n > 0).astype("UInt8")
+    out["hr_rest"] = np.where(n > 0, hr_rest, np.nan).astype("float32")
+    out["stress_mean"] = stress_mean.astype("float32")
+    out["stress_max"] = (pd.Series(stress_max, index=df.index)
+                         .where(sn > 0).astype("UInt8"))
+    return out
+
+
+def annotated(start=None, end=None) -> pd.DataFrame:
+    """
+    load() with SENSOR_COLS added, computed once per data version (sleep
+    log + both sensor stores) and shared by every session – read-only.
+    With `start`/`end`, only sleeps starting in [start, end): sliced from
+    the whole frame if it is cached, else annotated on their own and
+    cached per range (the newest ANNOTATED_ITEMS frames are kept).
+    """
+    hr, st = open_series("heart_rate"), open_series("stress")
+    version = (data_version(), _store_key("heart_rate"), _store_key("stress"))
+    span = tuple(None if t is None else pd.Timestamp(t) for t in (start, end))
+    with _LOCK:
+        df = _ANNOTATED.get((version, *span))
+        whole = _ANNOTATED.get((version, None, None))
+    if df is None and whole is not None:
+        df = _between(whole, start, end)
+    if df is None:
+        df = annotate(load(start=start, end=end), hr, st)
+        with _LOCK:
+            for old in [k for k in _ANNOTATED if k[0] != version]:
+                del _ANNOTATED[old]             # older data version
+            while len(_ANNOTATED) >= ANNOTATED_ITEMS:
+                del _ANNOTATED[next(iter(_ANNOTATED))]  # oldest first
+            _ANNOTATED[(version, *span)] = df
+    return df.copy(deep=False)
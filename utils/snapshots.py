@@ -0,0 +1,167 @@
+# utils/snapshots.py
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from .data_io import COLUMNS, DATA_DIR, LOCK_PATH, TZ, data_version, load
+from .locking import atomic_write, file_lock
+
+# ── Point-in-time snapshots of the sleep log ──────────────────────────────
+# The log's own rows (not the read-only legacy archive), taken before
+# every write that can change or drop existing rows (History saves and
+# imports, overwrite(), clear(), a restore). Rows are told apart by a
+# hash of all their values, so a snapshot stores only what changed since
+# the previous one: the rows that are new (gzip pickle) and the hashes of
+# the rows that went away. Every FULL_EVERY-th snapshot stores the whole
+# log instead, so rebuilding any point in time replays at most
+# FULL_EVERY - 1 deltas. Nothing is stored when the log hasn't changed
+# since the last snapshot. Old chains beyond KEEP_FULLS bases are pruned.
+# SLEEP_SNAPSHOTS=0 turns snapshots off.
+
+SNAP_DIR = DATA_DIR / "snapshots"
+INDEX_PATH = SNAP_DIR / "index.json"   # [{id, kind, time, reason, …}, …]
+ENABLED = os.environ.get("SLEEP_SNAPSHOTS", "1") != "0"
+FULL_EVERY = 10
+KEEP_FULLS = int(os.environ.get("SLEEP_SNAPSHOT_FULLS", "4"))
+GZIP = {"method": "gzip", "compresslevel": 1}   # ~2x faster than level 9
+
+
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """64-bit hash of every row's values (schema-shaped frame)."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _tagged(hashes: np.ndarray) -> pd.MultiIndex:
+    """(hash, n-th occurrence) – identical rows become distinct entries."""
+    nth = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+    return pd.MultiIndex.from_arrays([hashes, nth])
+
+
+def _path(entry: dict):
+    return SNAP_DIR / entry["file"]
+
+
+def _tip_path(sid: int):
+    """Row hashes of snapshot `sid`, kept for the newest one only."""
+    return SNAP_DIR / f"{sid:06d}.tip.npy"
+
+
+def _save_tip(sid: int, hashes: np.ndarray) -> None:
+    def write(tmp):
+        with open(tmp, "wb") as fh:
+            np.save(fh, hashes)
+    atomic_write(_tip_path(sid), write)
+    for old in SNAP_DIR.glob("*.tip.npy"):
+        if old != _tip_path(sid):
+            old.unlink(missing_ok=True)
+
+
+def _fingerprint() -> str:
+    return hashlib.sha1(repr(data_version()).encode()).hexdigest()
+
+
+def snapshots() -> list[dict]:
+    """
+    Every snapshot kept, oldest first: id, kind ("full"/"delta"), time,
+    reason, rows, added, removed, bytes.
+    """
+    try:
+        return json.loads(INDEX_PATH.read_text())
+    except FileNotFoundError:
+        return []
+
+
+def _save_index(entries: list[dict]) -> None:
+    atomic_write(INDEX_PATH,
+                 lambda tmp: tmp.write_text(json.dumps(entries, indent=1)))
+
+
+def _prune(entries: list[dict]) -> list[dict]:
+    """Drop the chains older than the newest KEEP_FULLS full snapshots."""
+    fulls = [i for i, e in enumerate(entries) if e["kind"] == "full"]
+    if len(fulls) <= KEEP_FULLS:
+        return entries
+    cut = fulls[-KEEP_FULLS]
+    for entry in entries[:cut]:
+        _path(entry).unlink(missing_ok=True)
+    return entries[cut:]
+
+
+def take(reason: str) -> dict | None:
+    """
+    Snapshot the log (without the legacy archive) now, as a delta against the previous
+    snapshot (or in full every FULL_EVERY). Returns its index entry, or
+    None when disabled or nothing changed since the last one.
+    """
+    if not ENABLED:
+        return None
+    with file_lock(LOCK_PATH):          # the log's writers wait meanwhile
+        entries = snapshots()
+        fingerprint = _fingerprint()
+        if entries and entries[-1]["fingerprint"] == fingerprint:
+            return None                 # log untouched since
+        df = (load(legacy=False)                # the archive is read-only
+              .reindex(columns=COLUMNS).reset_index(drop=True))
+        hashes = _row_hashes(df)
+        since_full = next((i for i, e in enumerate(reversed(entries))
+                           if e["kind"] == "full"), None)
+        tip = _tip_path(entries[-1]["id"]) if entries else None
+        full = since_full is None or since_full + 1 >= FULL_EVERY \
+            or not tip.exists()
+        if full:
+            payload, added, removed = {"rows": df}, len(df), 0
+        else:
+            prev, cur = _tagged(np.load(tip)), _tagged(hashes)
+            gone = prev[~prev.isin(cur)].get_level_values(0).to_numpy()
+            new = ~cur.isin(prev)
+            if not new.any() and not len(gone):
+                return None             # rewritten, but the same rows
+            payload = {"rows": df[new], "removed": gone}
+            added, removed = int(new.sum()), len(gone)
+
+        sid = entries[-1]["id"] + 1 if entries else 1
+        kind = "full" if full else "delta"
+        entry = {"id": sid, "kind": kind,
+                 "time": pd.Timestamp.now(TZ).tz_localize(None)
+                           .isoformat(timespec="seconds"),
+                 "reason": reason, "rows": len(df), "added": added,
+                 "removed": removed, "file": f"{sid:06d}.{kind}.pkl.gz",
+                 "fingerprint": fingerprint}
+        SNAP_DIR.mkdir(parents=True, exist_ok=True)
+        atomic_write(_path(entry),
+                     lambda tmp: pd.to_pickle(payload, tmp, compression=GZIP))
+        entry["bytes"] = _path(entry).stat().st_size
+        _save_index(_prune(entries + [entry]))
+        _save_tip(sid, hashes)
+    return entry
+
+
+def rebuild(sid: int) -> pd.DataFrame:
+    """The log as it was at snapshot `sid`: its full base + deltas."""
+    entries = snapshots()
+    at = next((i for i, e in enumerate(entries) if e["id"] == sid), None)
+    if at is None:
+        raise ValueError(f"No snapshot {sid}")
+    base = max(i for i in range(at + 1) if entries[i]["kind"] == "full")
+    df = pd.read_pickle(_path(entries[base]), compression="gzip")["rows"]
+    hashes = _row_hashes(df)
+    for entry in entries[base + 1:at + 1]:
+        delta = pd.read_pickle(_path(entry), compression="gzip")
+        keep = ~_tagged(hashes).isin(_tagged(delta["removed"]))
+        df = pd.concat([df[keep], delta["rows"]], ignore_index=True)
+        hashes = np.concatenate([hashes[keep], _row_hashes(delta["rows"])])
+    return (df.sort_values("start_time", kind="stable")
+              .reset_index(drop=True))
+
+
+def restore(sid: int) -> int:
+    """
+    Make the log what it was at snapshot `sid` (the current state is
+    snapshotted first, so a restore can be undone). Returns the rows.
+    """
+    from .data_io import overwrite
+    df = rebuild(sid)
+    take("restore")
+    overwrite(df)
+    return len(df)
@@ -0,0 +1,176 @@
+# utils/storage.py
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+import pandas as pd
+
+# ── On-disk formats for the sleep log ─────────────────────────────────────
+# Each format reads/writes one file (the base log or a journal segment).
+# Typed formats keep dtypes on disk, so no datetime inference or unit
+# clean-up is needed on read; CSV stays for import/export and old logs.
+
+
+class CsvFormat:
+    name = "csv"
+    suffix = ".csv"
+    typed = False          # values need parsing + normalising on read
+    appendable = True      # rows can be appended to an existing file
+    journaled = True       # appends go to journal segments first
+
+    def read(self, path: Path, columns=None, dt_cols=()) -> pd.DataFrame:
+        parse = [c for c in dt_cols if columns is None or c in columns]
+        return pd.read_csv(path, usecols=columns, parse_dates=parse)
+
+    def write(self, df: pd.DataFrame, path: Path) -> None:
+        df.to_csv(path, index=False)
+
+    def append(self, df: pd.DataFrame, path: Path) -> None:
+        header = not path.exists() or not path.stat().st_size
+        df.to_csv(path, mode="a", header=header, index=False)
+
+
+class ParquetFormat:
+    name = "parquet"
+    suffix = ".parquet"
+    typed = True
+    appendable = False     # every journal write becomes its own segment
+    journaled = True
+
+    def read(self, path: Path, columns=None, dt_cols=()) -> pd.DataFrame:
+        return pd.read_parquet(path, columns=columns)
+
+    def write(self, df: pd.DataFrame, path: Path) -> None:
+        df.to_parquet(path, index=False)
+
+
+class FeatherFormat:
+    name = "feather"
+    suffix = ".feather"
+    typed = True
+    appendable = False
+    journaled = True
+
+    def read(self, path: Path, columns=None, dt_cols=()) -> pd.DataFrame:
+        return pd.read_feather(path, columns=columns)
+
+    def write(self, df: pd.DataFrame, path: Path) -> None:
+        df.reset_index(drop=True).to_feather(path)
+
+
+class SqliteFormat:
+    """
+    Single-file SQLite table with a unique index on (start_time, end_time).
+    Writes are indexed upserts, so no journal/compaction is needed.
+    Timestamps are stored as fixed-width ISO text (sorts chronologically).
+    """
+    name = "sqlite"
+    suffix = ".sqlite"
+    typed = True
+    appendable = True
+    journaled = False
+
+    TABLE = "sleep_log"
+    KEYS = ["start_time", "end_time"]
+    VALUES = ["physical_recovery", "mental_recovery",
+              "sleep_cycle", "sleep_score", "sleep_duration"]
+    STAMPS = ["create_time", "update_time"]
+    DT_FMT = "%Y-%m-%d %H:%M:%S.%f"
+
+    def _connect(self, path: Path) -> sqlite3.Connection:
+        con = sqlite3.connect(path)
+        con.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                start_time TEXT, end_time TEXT,
+                physical_recovery INTEGER, mental_recovery INTEGER,
+                sleep_cycle INTEGER, sleep_score INTEGER,
+                sleep_duration REAL,
+                create_time TEXT, update_time TEXT
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS {self.TABLE}_span
+                ON {self.TABLE} (start_time, end_time);
+        """)
+        return con
+
+    def _rows(self, df: pd.DataFrame) -> list:
+        """DataFrame → list of plain-Python tuples in table column order."""
+        out = pd.DataFrame(index=df.index)
+        for c in self.KEYS + self.STAMPS:
+            out[c] = pd.to_datetime(df[c], errors="coerce").dt.strftime(self.DT_FMT)
+        for c in self.VALUES:
+            out[c] = pd.to_numeric(df[c], errors="coerce").astype("float64")
+        out["sleep_duration"] = out["sleep_duration"].round(5)
+        cols = self.KEYS + self.VALUES + self.STAMPS
+        out = out[cols].astype(object).where(out[cols].notna(), None)
+        return list(out.itertuples(index=False, name=None))
+
+    def read(self, path: Path, columns=None, dt_cols=(),
+             start=None, end=None) -> pd.DataFrame:
+        """Read the table; `start`/`end` bound start_time via the index."""
+        cols = columns or self.KEYS + self.VALUES + self.STAMPS
+        sql, args = f"SELECT {', '.join(cols)} FROM {self.TABLE}", []
+        if start is not None or end is not None:
+            sql += " WHERE start_time >= ? AND start_time < ?"
+            args = [pd.Timestamp(start or pd.Timestamp.min).strftime(self.DT_FMT),
+                    pd.Timestamp(end or pd.Timestamp.max).strftime(self.DT_FMT)]
+        with closing(self._connect(path)) as con:
+            df = pd.read_sql_query(sql + " ORDER BY start_time", con, params=args)
+        for c in df.columns.intersection(self.KEYS + self.STAMPS):
+            df[c] = pd.to_datetime(df[c], format=self.DT_FMT)
+        return df
+
+    def write(self, df: pd.DataFrame, path: Path) -> None:
+        self.upsert(df, path)
+
+    def append(self, df: pd.DataFrame, path: Path) -> None:
+        self.upsert(df, path)
+
+    def upsert(self, df: pd.DataFrame, path: Path) -> tuple[int, int]:
+        """
+        INSERT … ON CONFLICT(start_time, end_time) DO UPDATE in one
+        transaction. Blank incoming values keep the stored ones, and
+        update_time only moves when some value really changed.
+        Returns (inserted, updated).
+        """
+        cols = self.KEYS + self.VALUES + self.STAMPS
+        sets = ",\n".join(
+            f"{c} = COALESCE(excluded.{c}, {c})" for c in self.VALUES)
+        changed = " OR ".join(
+            f"(excluded.{c} IS NOT NULL AND excluded.{c} IS NOT {c})"
+            for c in self.VALUES)
+        sql = f"""
+            INSERT INTO {self.TABLE} ({', '.join(cols)})
+            VALUES ({', '.join('?' * len(cols))})
+            ON CONFLICT (start_time, end_time) DO UPDATE SET
+                {sets},
+                update_time = excluded.update_time
+            WHERE {changed}
+        """
+        count = f"SELECT count(*) FROM {self.TABLE}"
+        with closing(self._connect(path)) as con, con:    # one transaction
+            (before,) = con.execute(count).fetchone()
+            touched = con.total_changes
+            con.executemany(sql, self._rows(df))
+            (after,) = con.execute(count).fetchone()
+            touched = con.total_changes - touched
+        return after - before, touched - (after - before)
+
+
+FORMATS = {f.name: f for f in (
+    CsvFormat(), ParquetFormat(), FeatherFormat(), SqliteFormat())}
+
+
+def get_format(name: str):
+    """Look up a format by name ("csv", "parquet", "feather", "sqlite")."""
+    try:
+        return FORMATS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown storage format {name!r}; pick one of {sorted(FORMATS)}")
+
+
+def format_for(path: Path):
+    """Format matching a file's suffix (base files & segments alike)."""
+    for fmt in FORMATS.values():
+        if path.name.endswith(fmt.suffix):
+            return fmt
+    raise ValueError(f"No storage format for {path}")
@@ -0,0 +1,107 @@
+# utils/timeviews.py
+import threading
+import numpy as np
+import pandas as pd
+from .data_io import TZ, data_version, load
+
+# ── Integer views of the log's timestamps ─────────────────────────────────
+# The log holds naïve Asia/Taipei datetimes, which are int64 nanoseconds
+# underneath. The helpers here work on that integer – minute of day, day
+# number, "HH:MM" from a 1440-entry table – instead of .dt / strftime,
+# which cost seconds per million rows. views() derives the arrays (plus
+# UTC epoch seconds) for the whole log once per data_version(); pages and
+# the predictor share them.
+
+NS_S = 10**9
+NS_MIN = 60 * NS_S
+NS_DAY = 24 * 60 * NS_MIN
+HHMM = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)],
+                dtype=object)
+EPOCH_COLS = {"start_time": "start_utc", "end_time": "end_utc",
+              "create_time": "create_utc", "update_time": "update_utc"}
+
+_STATE: dict = {}                  # {"version": …, "views": DataFrame}
+_LOCK = threading.Lock()
+
+
+def _ns(col) -> tuple[np.ndarray, np.ndarray]:
+    """Naïve datetimes → (int64 nanoseconds, NaT mask)."""
+    ns = pd.to_datetime(pd.Series(col)).to_numpy("datetime64[ns]").view("int64")
+    return ns, ns == np.iinfo("int64").min
+
+
+def minute_of_day(col) -> pd.Series:
+    """Clock time as minutes after midnight (Int16, <NA> for NaT)."""
+    ns, nat = _ns(col)
+    out = pd.array(ns % NS_DAY // NS_MIN, dtype="Int16")
+    out[nat] = pd.NA
+    return pd.Series(out, index=getattr(col, "index", None))
+
+
+def time_of_day(col) -> pd.Series:
+    """Clock time as a timedelta, truncated to whole seconds."""
+    ns, nat = _ns(col)
+    out = np.where(nat, ns, ns % NS_DAY // NS_S * NS_S).view("m8[ns]")
+    return pd.Series(out, index=getattr(col, "index", None))
+
+
+def floor_day(col) -> pd.Series:
+    """Midnight of each timestamp's day (.dt.normalize(), NaT kept)."""
+    ns, nat = _ns(col)
+    out = np.where(nat, ns, ns // NS_DAY * NS_DAY).view("M8[ns]")
+    return pd.Series(out, index=getattr(col, "index", None))
+
+
+def hhmm(col) -> pd.Series:
+    """ "HH:MM" of each timestamp, "" for NaT (.dt.strftime("%H:%M"))."""
+    ns, nat = _ns(col)
+    out = HHMM[ns % NS_DAY // NS_MIN]
+    out[nat] = ""
+    return pd.Series(out, index=getattr(col, "index", None))
+
+
+def ymd(col) -> pd.Series:
+    """ "YYYY-MM-DD" of each timestamp, "NaT" for NaT."""
+    ns, _ = _ns(col)
+    out = np.datetime_as_string(ns.view("M8[ns]").astype("M8[D]"))
+    return pd.Series(out.astype(object), index=getattr(col, "index", None))
+
+
+def epoch_seconds(col) -> pd.Series:
+    """Naïve local datetimes → UTC epoch seconds (Int64, <NA> for NaT)."""
+    utc = (pd.to_datetime(pd.Series(col))
+             .dt.tz_localize(TZ.key, nonexistent="shift_forward",
+                             ambiguous="NaT")
+             .dt.tz_convert("UTC"))
+    ns, nat = _ns(utc.dt.tz_localize(None))
+    out = pd.array(ns // NS_S, dtype="Int64")
+    out[nat] = pd.NA
+    return pd.Series(out, index=getattr(col, "index", None))
+
+
+def _build(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.dropna(subset=["start_time"])
+    df = df.iloc[np.argsort(_ns(df["start_time"])[0], kind="stable")]
+    out = pd.DataFrame(index=df.index)
+    for col, name in EPOCH_COLS.items():
+        out[name] = epoch_seconds(df[col])
+    out["day"] = (_ns(df["start_time"])[0] // NS_DAY).astype("int32")
+    out["start_min"] = minute_of_day(df["start_time"]).astype("int16")
+    out["end_min"] = minute_of_day(df["end_time"])
+    return out
+
+
+def views() -> pd.DataFrame:
+    """
+    One row per load() row with a start_time, oldest first, indexed like
+    load(): start_utc / end_utc / create_utc / update_utc (UTC epoch
+    seconds), day (local date as days since 1970-01-01), start_min and
+    end_min (local minute of day). Built once per data_version() –
+    treat it as read-only.
+    """
+    version = data_version()
+    with _LOCK:
+        if "version" not in _STATE or _STATE["version"] != version:
+            _STATE.clear()
+            _STATE.update(views=_build(load()), version=version)
+        return _STATE["views"]
@@ -1,12 +1,18 @@
 import streamlit as st
-from utils import load
+from utils.rollups import totals
+from utils.perf import page_run
+from utils.prewarm import prewarm
 
 st.set_page_config(page_title="Sleep App", page_icon="💤")
-st.title("💤 Sleep Tracker - Dashboard")
+with page_run("Home"):
+    st.title("💤 Sleep Tracker - Dashboard")
 
-df = load()
-if len(df):
-    st.metric("Total nights logged", len(df))
-    st.metric("Average duration (h)", round(df["sleep_duration"].mean(), 2))
-else:
-    st.info("No data yet – go to **Input** to add your first record!")
+    summary = totals()
+    if summary["nights"]:
+        st.metric("Total nights logged", summary["nights"])
+        if summary["duration_mean"] is not None:
+            st.metric("Average duration (h)", round(summary["duration_mean"], 2))
+    else:
+        st.info("No data yet – go to **Input** to add your first record!")
+
+prewarm()